@@ -0,0 +1,21 @@
+"""Cache lifetimes that depend on whether the cache is shared.
+
+Version keys (catalogue, purchases) only invalidate across gunicorn
+workers and management commands when every process reads the same
+cache. With a per-process cache (LocMem, the default without REDIS_URL)
+a bump in one worker is invisible to the others, so entries must expire
+quickly instead.
+"""
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def cache_is_shared(alias="default"):
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def cache_timeout(shared_timeout, local_timeout, alias="default"):
+    """Return shared_timeout for a shared cache, else local_timeout."""
+    return shared_timeout if cache_is_shared(alias) else local_timeout
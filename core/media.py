@@ -0,0 +1,88 @@
+"""Memoised media URLs, with Cloudinary transformations built offline.
+
+MediaCloudinaryStorage builds a CloudinaryResource for every ``.url``
+call and never asks for automatic format or quality. Delivery URLs only
+depend on the cloud name, the public id and the transformation, so they
+are assembled here as strings and memoised per (name, transform) in an
+LRU. With any other storage the helper memoises ``default_storage.url``.
+"""
+
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+CLOUDINARY_BACKEND = "cloudinary_storage.storage.MediaCloudinaryStorage"
+CACHED_BACKEND = "core.storage.CachedStorage"
+DELIVERY_ROOT = "https://res.cloudinary.com"
+URL_CACHE_SIZE = 4096
+
+
+def storage_backend():
+    """Dotted path of the storage that really holds media files."""
+    default = settings.STORAGES.get("default", {})
+    if default.get("BACKEND") == CACHED_BACKEND:
+        return default.get("OPTIONS", {}).get("backend")
+    return default.get("BACKEND")
+
+
+def uses_cloudinary():
+    return storage_backend() == CLOUDINARY_BACKEND
+
+
+def cloud_name():
+    return (getattr(settings, "CLOUDINARY_STORAGE", {}) or {}).get(
+        "CLOUDINARY_CLOUD_NAME"
+    )
+
+
+def public_id(name):
+    """Apply the storage prefix the way MediaCloudinaryStorage does."""
+    storage_settings = getattr(settings, "CLOUDINARY_STORAGE", {}) or {}
+    prefix = storage_settings.get("PREFIX", settings.MEDIA_URL) or ""
+    prefix = prefix.strip("/")
+    prefix = f"{prefix}/" if prefix else ""
+    return name if name.startswith(prefix) else prefix + name
+
+
+def transformation(width=None, height=None, dpr=None):
+    """Return a Cloudinary transformation such as "f_auto,q_auto,w_400"."""
+    parts = ["f_auto", "q_auto"]
+    if width and height:
+        parts.append("c_fill")
+    elif width or height:
+        parts.append("c_limit")  # never upscale a width-only request
+    if width:
+        parts.append(f"w_{int(width)}")
+    if height:
+        parts.append(f"h_{int(height)}")
+    if dpr:
+        parts.append(f"dpr_{float(dpr):.1f}")
+    return ",".join(parts)
+
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def media_url(name, width=None, height=None, dpr=None):
+    """Return the delivery URL for a stored media name (memoised)."""
+    if not name:
+        return ""
+    if name.startswith(("http://", "https://")):
+        return name
+    cloud = cloud_name()
+    if not (uses_cloudinary() and cloud):
+        return default_storage.url(name)
+    return (
+        f"{DELIVERY_ROOT}/{cloud}/image/upload/"
+        f"{transformation(width, height, dpr)}/{quote(public_id(name))}"
+    )
+
+
+@receiver(setting_changed)
+def clear_media_urls(setting, **kwargs):
+    if setting in {
+        "STORAGES", "MEDIA_URL", "MEDIA_ROOT", "CLOUDINARY_STORAGE"
+    }:
+        media_url.cache_clear()
@@ -0,0 +1,306 @@
+"""Media storage backends: a read-through cache and a counting memory store.
+
+Every ``exists()``, ``url()``, ``size()`` and ``open()`` on Cloudinary is
+an HTTP round trip. CachedStorage wraps the real backend and answers hot
+reads from the dyno instead:
+
+- metadata (exists/url/size) lives in the Django cache, so answers are
+  shared by the processes on a host when the cache is;
+- blob bytes live in a bounded on-disk LRU under ``location``.
+
+Saves write through to both, deletes invalidate both. Configure it in
+STORAGES with the wrapped backend in OPTIONS:
+
+    "default": {
+        "BACKEND": "core.storage.CachedStorage",
+        "OPTIONS": {
+            "backend": "cloudinary_storage.storage.MediaCloudinaryStorage",
+            "location": "/tmp/media-cache",
+            "max_bytes": 256 * 1024 * 1024,
+        },
+    }
+
+The byte bound is enforced per process; files written by sibling
+processes join this process's index when it first reads them, and a
+blob a sibling evicted is simply fetched from the backend again.
+
+CountingMemoryStorage keeps files in memory and counts every operation,
+so tests and local benchmarks never touch MEDIA_ROOT and can assert how
+much storage traffic a view causes (MEDIA_STORAGE=memory selects it).
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import InMemoryStorage, Storage
+from django.utils.module_loading import import_string
+
+META_PREFIX = "media-meta:"
+META_TTL = 24 * 60 * 60
+# Misses are cached briefly: another process may save the file meanwhile.
+MISS_TTL = 60
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+class CachedStorage(Storage):
+    def __init__(
+        self,
+        backend="django.core.files.storage.FileSystemStorage",
+        backend_options=None,
+        location=None,
+        max_bytes=DEFAULT_MAX_BYTES,
+        meta_ttl=META_TTL,
+    ):
+        self.backend = import_string(backend)(**(backend_options or {}))
+        self.location = Path(
+            location or Path(tempfile.gettempdir()) / "media-cache"
+        )
+        self.max_bytes = max_bytes
+        self.meta_ttl = meta_ttl
+        self._lock = threading.Lock()
+        self._blobs = None  # OrderedDict of path -> size, oldest first
+
+    # Metadata -----------------------------------------------------------
+
+    def _meta_key(self, name):
+        return META_PREFIX + hashlib.sha1(name.encode()).hexdigest()
+
+    def _meta(self, name):
+        return cache.get(self._meta_key(name)) or {}
+
+    def _remember(self, name, **values):
+        meta = {**self._meta(name), **values}
+        ttl = self.meta_ttl if meta.get("exists", True) else MISS_TTL
+        cache.set(self._meta_key(name), meta, ttl)
+
+    def exists(self, name):
+        meta = self._meta(name)
+        if "exists" not in meta:
+            meta["exists"] = self.backend.exists(name)
+            self._remember(name, exists=meta["exists"])
+        return meta["exists"]
+
+    def url(self, name):
+        meta = self._meta(name)
+        if "url" not in meta:
+            meta["url"] = self.backend.url(name)
+            self._remember(name, url=meta["url"])
+        return meta["url"]
+
+    def size(self, name):
+        meta = self._meta(name)
+        if meta.get("size") is None:
+            meta["size"] = self.backend.size(name)
+            self._remember(name, size=meta["size"])
+        return meta["size"]
+
+    # Blobs --------------------------------------------------------------
+
+    def _blob_path(self, name):
+        digest = hashlib.sha1(name.encode()).hexdigest()
+        return self.location / digest[:2] / digest
+
+    def _index(self):
+        """Load the LRU from disk once, oldest modification first."""
+        if self._blobs is None:
+            found = []
+            if self.location.is_dir():
+                for path in self.location.glob("*/*"):
+                    stat = path.stat()
+                    found.append((stat.st_mtime, path, stat.st_size))
+            self._blobs = OrderedDict(
+                (path, size) for _mtime, path, size in sorted(found)
+            )
+        return self._blobs
+
+    def _touch(self, path):
+        with self._lock:
+            blobs = self._index()
+            if path in blobs:
+                blobs.move_to_end(path)
+            else:
+                # Cached by a sibling process after our index was loaded.
+                try:
+                    blobs[path] = path.stat().st_size
+                except FileNotFoundError:
+                    return
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _cache_blob(self, name, content):
+        """Copy content into the disk cache and evict down to max_bytes."""
+        path = self._blob_path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if hasattr(content, "seek"):
+            content.seek(0)
+        fd, temp = tempfile.mkstemp(dir=path.parent)
+        size = 0
+        with os.fdopen(fd, "wb") as handle:
+            for chunk in content.chunks(CHUNK_SIZE):
+                handle.write(chunk)
+                size += len(chunk)
+        os.replace(temp, path)
+        with self._lock:
+            blobs = self._index()
+            blobs[path] = size
+            blobs.move_to_end(path)
+            total = sum(blobs.values())
+            while total > self.max_bytes and len(blobs) > 1:
+                old, old_size = blobs.popitem(last=False)
+                old.unlink(missing_ok=True)
+                total -= old_size
+        return path, size
+
+    def _drop_blob(self, name):
+        path = self._blob_path(name)
+        with self._lock:
+            self._index().pop(path, None)
+        path.unlink(missing_ok=True)
+
+    # Storage API --------------------------------------------------------
+
+    def _open(self, name, mode="rb"):
+        if "b" not in mode or any(flag in mode for flag in "wa+"):
+            return self.backend.open(name, mode)
+        path = self._blob_path(name)
+        try:
+            handle = open(path, mode)
+        except FileNotFoundError:
+            # Not cached, or evicted by a sibling process; refetch.
+            with self._lock:
+                self._index().pop(path, None)
+            with self.backend.open(name, mode) as remote:
+                path, size = self._cache_blob(name, File(remote))
+            self._remember(name, exists=True, size=size)
+            try:
+                handle = open(path, mode)
+            except FileNotFoundError:
+                return self.backend.open(name, mode)
+        else:
+            self._touch(path)
+        return File(handle, name=name)
+
+    def save(self, name, content, max_length=None):
+        stored = self.backend.save(name, content, max_length=max_length)
+        try:
+            _path, size = self._cache_blob(stored, File(content))
+        except (OSError, ValueError):
+            # Content that cannot be re-read is fetched on first open.
+            self._drop_blob(stored)
+            size = None
+        cache.set(
+            self._meta_key(stored), {"exists": True, "size": size},
+            self.meta_ttl,
+        )
+        return stored
+
+    def delete(self, name):
+        self.backend.delete(name)
+        self._drop_blob(name)
+        cache.set(self._meta_key(name), {"exists": False}, MISS_TTL)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def get_available_name(self, name, max_length=None):
+        return self.backend.get_available_name(name, max_length=max_length)
+
+    def get_valid_name(self, name):
+        return self.backend.get_valid_name(name)
+
+    def generate_filename(self, filename):
+        return self.backend.generate_filename(filename)
+
+    def get_accessed_time(self, name):
+        return self.backend.get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.backend.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
+
+
+class CountingMemoryStorage(InMemoryStorage):
+    """
+    InMemoryStorage that counts calls per operation and bytes moved.
+
+    ``counts`` tallies save/open/exists/url/size/delete/listdir as seen by
+    callers; the exists() checks save() makes while picking a free name
+    are not counted. ``reset_counts()`` starts a fresh tally.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counter_lock = threading.Lock()
+        self._internal = threading.local()
+        self.reset_counts()
+
+    def reset_counts(self):
+        with self._counter_lock:
+            self.counts = Counter()
+            self.bytes_written = 0
+            self.bytes_read = 0
+
+    @property
+    def reads(self):
+        return sum(self.counts[op] for op in ("open", "exists", "url", "size"))
+
+    @property
+    def writes(self):
+        return self.counts["save"] + self.counts["delete"]
+
+    def _count(self, operation, written=0, read=0):
+        if getattr(self._internal, "active", False):
+            return
+        with self._counter_lock:
+            self.counts[operation] += 1
+            self.bytes_written += written
+            self.bytes_read += read
+
+    def save(self, name, content, max_length=None):
+        self._internal.active = True
+        try:
+            stored = super().save(name, content, max_length=max_length)
+            written = super().size(stored)
+        finally:
+            self._internal.active = False
+        self._count("save", written=written)
+        return stored
+
+    def _open(self, name, mode="rb"):
+        handle = super()._open(name, mode)
+        self._count("open", read=handle.size)
+        return handle
+
+    def exists(self, name):
+        self._count("exists")
+        return super().exists(name)
+
+    def url(self, name):
+        self._count("url")
+        return super().url(name)
+
+    def size(self, name):
+        self._count("size")
+        return super().size(name)
+
+    def delete(self, name):
+        self._count("delete")
+        super().delete(name)
+
+    def listdir(self, path):
+        self._count("listdir")
+        return super().listdir(path)
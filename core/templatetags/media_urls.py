@@ -0,0 +1,33 @@
+"""Template filters for memoised, CDN-sized media URLs."""
+
+import re
+
+from django import template
+
+from core.media import media_url
+
+register = template.Library()
+
+SPEC_RE = re.compile(r"^(\d+)?(?:x(\d+))?(?:@(\d+(?:\.\d+)?)x?)?$")
+
+
+@register.filter
+def cdn_url(image, spec=""):
+    """
+    Return a sized URL for an image field or stored name.
+
+    ``spec`` is "WIDTH", "WIDTHxHEIGHT" and/or "@DPR", e.g.
+    ``{{ s.img_path|cdn_url:"400x300@2" }}``. Unknown specs return the
+    untransformed URL.
+    """
+    name = getattr(image, "name", image) or ""
+    match = SPEC_RE.match(str(spec or ""))
+    if not match:
+        return media_url(name)
+    width, height, dpr = match.groups()
+    return media_url(
+        name,
+        int(width) if width else None,
+        int(height) if height else None,
+        float(dpr) if dpr else None,
+    )
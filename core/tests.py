@@ -0,0 +1,162 @@
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from .media import media_url, uses_cloudinary
+from .storage import CachedStorage, CountingMemoryStorage
+
+CLOUDINARY = {
+    "default": {
+        "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage"
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+    },
+}
+
+
+@override_settings(
+    STORAGES=CLOUDINARY,
+    CLOUDINARY_STORAGE={"CLOUDINARY_CLOUD_NAME": "wagclub"},
+    MEDIA_URL="/media/",
+)
+class CloudinaryMediaUrlTests(SimpleTestCase):
+    def test_builds_transformation_urls_from_the_public_id(self):
+        self.assertEqual(
+            media_url("services/dog.jpg", 400, 300, 2),
+            "https://res.cloudinary.com/wagclub/image/upload/"
+            "f_auto,q_auto,c_fill,w_400,h_300,dpr_2.0/media/services/dog.jpg",
+        )
+        self.assertEqual(
+            media_url("media/services/dog.jpg", 640),
+            "https://res.cloudinary.com/wagclub/image/upload/"
+            "f_auto,q_auto,c_limit,w_640/media/services/dog.jpg",
+        )
+        self.assertEqual(
+            media_url("https://example.com/a.png"), "https://example.com/a.png"
+        )
+
+    def test_urls_are_memoised_per_name_and_transform(self):
+        media_url.cache_clear()
+        media_url("services/dog.jpg", 400)
+        media_url("services/dog.jpg", 400)
+        media_url("services/dog.jpg", 800)
+        info = media_url.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 2))
+
+    def test_cdn_url_filter_parses_size_specs(self):
+        html = Template(
+            '{% load media_urls %}{{ name|cdn_url:"320x240@2x" }}'
+        ).render(Context({"name": "services/dog.jpg"}))
+        self.assertIn("c_fill,w_320,h_240,dpr_2.0", html)
+
+
+class LocalMediaUrlTests(SimpleTestCase):
+    def test_other_storages_fall_back_to_storage_url(self):
+        self.assertEqual(
+            media_url("services/dog.jpg", 400),
+            default_storage.url("services/dog.jpg"),
+        )
+
+
+class CachedStorageTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.storage = CachedStorage(
+            backend_options={"location": f"{root}/media", "base_url": "/m/"},
+            location=f"{root}/cache",
+            max_bytes=10,
+        )
+        self.backend = self.storage.backend
+
+    def test_hot_reads_do_not_touch_the_backend(self):
+        name = self.storage.save("qr/a.png", ContentFile(b"12345"))
+        with patch.object(self.backend, "exists") as exists, \
+                patch.object(self.backend, "size") as size, \
+                patch.object(self.backend, "open") as backend_open:
+            self.assertTrue(self.storage.exists(name))
+            self.assertEqual(self.storage.size(name), 5)
+            with self.storage.open(name) as handle:
+                self.assertEqual(handle.read(), b"12345")
+        exists.assert_not_called()
+        size.assert_not_called()
+        backend_open.assert_not_called()
+
+        with patch.object(self.backend, "url", wraps=self.backend.url) as url:
+            self.assertEqual(self.storage.url(name), "/m/qr/a.png")
+            self.assertEqual(self.storage.url(name), "/m/qr/a.png")
+        self.assertEqual(url.call_count, 1)
+
+    def test_delete_invalidates_metadata_and_blob(self):
+        name = self.storage.save("qr/a.png", ContentFile(b"12345"))
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(self.backend.exists(name))
+        self.assertFalse(self.storage._blob_path(name).exists())
+
+    def test_disk_cache_evicts_least_recently_used(self):
+        first = self.storage.save("qr/a.png", ContentFile(b"aaaaaa"))
+        second = self.storage.save("qr/b.png", ContentFile(b"bbbbbb"))
+        self.assertFalse(self.storage._blob_path(first).exists())
+        self.assertTrue(self.storage._blob_path(second).exists())
+        with patch.object(self.backend, "open", wraps=self.backend.open) as fetch:
+            with self.storage.open(first) as handle:
+                self.assertEqual(handle.read(), b"aaaaaa")
+        fetch.assert_called_once()
+        self.assertFalse(self.storage._blob_path(second).exists())
+
+    def test_instances_sharing_a_cache_dir_tolerate_each_other(self):
+        sibling = CachedStorage(
+            backend_options={
+                "location": self.backend.location, "base_url": "/m/",
+            },
+            location=self.storage.location,
+            max_bytes=10,
+        )
+        name = self.storage.save("qr/a.png", ContentFile(b"aaaa"))
+        sibling._index()  # loaded before the next blob is cached
+        second = self.storage.save("qr/b.png", ContentFile(b"bbbb"))
+        with sibling.open(second) as handle:
+            self.assertEqual(handle.read(), b"bbbb")
+        self.assertIn(sibling._blob_path(second), sibling._index())
+
+        # A sibling evicts the blob this instance still has indexed.
+        sibling._blob_path(name).unlink()
+        with self.storage.open(name) as handle:
+            self.assertEqual(handle.read(), b"aaaa")
+
+    @override_settings(STORAGES={
+        "default": {
+            "BACKEND": "core.storage.CachedStorage",
+            "OPTIONS": {"backend": CLOUDINARY["default"]["BACKEND"]},
+        },
+    })
+    def test_wrapped_cloudinary_is_still_detected(self):
+        self.assertTrue(uses_cloudinary())
+
+
+class CountingMemoryStorageTests(SimpleTestCase):
+    def test_counts_operations_and_bytes(self):
+        storage = CountingMemoryStorage()
+        name = storage.save("qr/a.png", ContentFile(b"12345"))
+        storage.save("qr/a.png", ContentFile(b"123"))
+        with storage.open(name) as handle:
+            handle.read()
+        storage.exists(name)
+        storage.delete(name)
+        self.assertEqual(
+            dict(storage.counts),
+            {"save": 2, "open": 1, "exists": 1, "delete": 1},
+        )
+        self.assertEqual((storage.reads, storage.writes), (2, 3))
+        self.assertEqual((storage.bytes_written, storage.bytes_read), (8, 5))
+        storage.reset_counts()
+        self.assertEqual(storage.writes, 0)
@@ -1,7 +1,7 @@
 """Admin registrations for orders."""
 
 from django.contrib import admin
-from .models import Order, OrderItem, Voucher
+from .models import Order, OrderItem, RedemptionEvent, Voucher
 
 
 class OrderItemInline(admin.TabularInline):
@@ -47,6 +47,25 @@ class VoucherAdmin(admin.ModelAdmin):
     actions = [mark_as_redeemed, mark_as_expired]
 
 
+@admin.register(RedemptionEvent)
+class RedemptionEventAdmin(admin.ModelAdmin):
+    """Read-only view of the append-only redemption audit log."""
+
+    list_display = ("created_at", "code", "outcome", "staff", "device")
+    list_filter = ("outcome", "created_at")
+    search_fields = ("code", "staff__username")
+    date_hierarchy = "created_at"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 admin.site.site_header = "The Wag Club Admin"
 admin.site.index_title = "Administration"
 admin.site.site_title = "The Wag Club Admin"
@@ -0,0 +1,81 @@
+"""Buffered writer and reporting for the redemption audit log."""
+
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+from .models import RedemptionEvent
+
+FLUSH_AT = 50  # write early once this many events are buffered
+
+
+class RedemptionAuditBuffer:
+    """
+    Collect RedemptionEvent rows in memory and write them with bulk_create,
+    either when FLUSH_AT events are pending or when flush() is called at the
+    end of the request by RedemptionAuditMiddleware.
+    """
+
+    def __init__(self, flush_at=FLUSH_AT):
+        self.flush_at = flush_at
+        self.pending = []
+
+    def add(self, **fields):
+        self.pending.append(RedemptionEvent(**fields))
+        if len(self.pending) >= self.flush_at:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return 0
+        events, self.pending = self.pending, []
+        RedemptionEvent.objects.bulk_create(events)
+        return len(events)
+
+
+def scanner_device(request):
+    """Identify the scanning device: explicit header, else user agent."""
+    device = (
+        request.headers.get("X-Scanner-Device")
+        or request.headers.get("User-Agent")
+        or ""
+    )
+    return device[:255]
+
+
+def record_redemption(request, code, outcome, voucher=None, at=None):
+    """
+    Queue an audit event for this request. Falls back to an immediate write
+    when the audit middleware is not installed. ``at`` dates the event to
+    when the scan happened (offline syncs); it defaults to now.
+    """
+    user = getattr(request, "user", None)
+    fields = {
+        "voucher": voucher,
+        "code": (code or "")[:64],
+        "staff": user if user is not None and user.is_authenticated else None,
+        "outcome": outcome,
+        "device": scanner_device(request),
+    }
+    if at is not None:
+        fields["created_at"] = at
+    buffer = getattr(request, "redemption_audit", None)
+    if buffer is None:
+        RedemptionEvent.objects.create(**fields)
+    else:
+        buffer.add(**fields)
+
+
+def redemptions_per_hour(start, end):
+    """
+    Count successful redemptions per staff member per hour in [start, end).
+    Returns dicts with staff, staff__username, hour and total.
+    """
+    return (
+        RedemptionEvent.objects.filter(
+            outcome="REDEEMED", created_at__gte=start, created_at__lt=end
+        )
+        .annotate(hour=TruncHour("created_at"))
+        .values("staff", "staff__username", "hour")
+        .annotate(total=Count("id"))
+        .order_by("hour", "staff__username")
+    )
@@ -0,0 +1,143 @@
+"""Session cart: line storage plus a maintained summary."""
+
+from decimal import Decimal
+
+from services.models import Service
+
+CART_SESSION_KEY = "cart"
+SUMMARY_SESSION_KEY = "cart_summary"
+
+
+def summarize(cart):
+    """Return the item count and total (as a 2dp string) for cart lines."""
+    count = 0
+    total = Decimal("0.00")
+    for item in cart.values():
+        quantity = int(item["quantity"])
+        count += quantity
+        total += Decimal(str(item["price"])) * quantity
+    return {"count": count, "total": str(total.quantize(Decimal("0.01")))}
+
+
+def store_cart(session, cart):
+    """Save cart lines and refresh the summary; the only cart write path."""
+    if cart:
+        session[CART_SESSION_KEY] = cart
+        session[SUMMARY_SESSION_KEY] = summarize(cart)
+    else:
+        session.pop(CART_SESSION_KEY, None)
+        session.pop(SUMMARY_SESSION_KEY, None)
+    session.modified = True
+
+
+def cart_summary(session):
+    """Read the stored summary, deriving it (without writing) if missing."""
+    summary = session.get(SUMMARY_SESSION_KEY)
+    if summary is None:
+        summary = summarize(session.get(CART_SESSION_KEY, {}))
+    return summary
+
+
+class Cart:
+    """
+    Cart backed by the session. Lines are copied on load and mutations stay
+    in memory until save(), which writes lines and summary back once; the
+    session middleware then persists the session a single time per request.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.lines = {
+            key: dict(item)
+            for key, item in session.get(CART_SESSION_KEY, {}).items()
+        }
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __contains__(self, service_id):
+        return str(service_id) in self.lines
+
+    def items(self):
+        return self.lines.items()
+
+    @property
+    def summary(self):
+        return summarize(self.lines)
+
+    def add(self, service, quantity=1):
+        """Add quantity of a service, pricing it from the database row."""
+        key = str(service.id)
+        if key in self.lines:
+            self.lines[key]["quantity"] += quantity
+        else:
+            self.lines[key] = {
+                "name": service.name,
+                # stored once; never trust client values
+                "price": float(service.price),
+                "quantity": quantity,
+            }
+        self.dirty = True
+
+    def set_quantity(self, service_id, quantity):
+        """Set a line's quantity; zero removes it. False if not in cart."""
+        key = str(service_id)
+        if key not in self.lines:
+            return False
+        if quantity <= 0:
+            del self.lines[key]
+        else:
+            self.lines[key]["quantity"] = quantity
+        self.dirty = True
+        return True
+
+    def remove(self, service_id):
+        """Remove a line; returns False if it was not in the cart."""
+        return self.set_quantity(service_id, 0)
+
+    def refresh(self):
+        """
+        Re-price every line from active services using one in_bulk query.
+
+        Lines for missing or inactive services are dropped and stale names
+        and prices are updated. Returns customer-facing notes for anything
+        that changed; call save() afterwards to persist the result.
+        """
+        ids = [int(key) for key in self.lines if key.isdigit()]
+        services = Service.objects.filter(is_active=True).in_bulk(ids)
+        changes = []
+        for key, item in list(self.lines.items()):
+            service = services.get(int(key)) if key.isdigit() else None
+            if service is None:
+                del self.lines[key]
+                self.dirty = True
+                changes.append(
+                    f"{item['name']} is no longer available and was "
+                    "removed from your cart."
+                )
+                continue
+
+            price = float(service.price)
+            if price != float(item["price"]):
+                changes.append(
+                    f"The price of {service.name} changed from "
+                    f"€{float(item['price']):.2f} to €{price:.2f}."
+                )
+                item["price"] = price
+                self.dirty = True
+            if service.name != item["name"]:
+                item["name"] = service.name
+                self.dirty = True
+        return changes
+
+    def clear(self):
+        if self.lines:
+            self.lines = {}
+            self.dirty = True
+
+    def save(self):
+        """Write pending changes to the session (no-op when unchanged)."""
+        if self.dirty:
+            store_cart(self.session, self.lines)
+            self.dirty = False
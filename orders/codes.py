@@ -0,0 +1,68 @@
+"""Compact voucher codes: Crockford base32 with a check character.
+
+Codes are 12 random symbols (60 bits from ``secrets``) plus one Luhn mod 32
+check symbol, e.g. ``7KQ2M9XW4HRT5``. The alphabet is uppercase-only and has
+no I/L/O/U, so codes stay in the QR alphanumeric set and survive being read
+out or retyped; ``normalize_code`` folds common typos back.
+"""
+
+import secrets
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+BODY_LENGTH = 12
+CODE_LENGTH = BODY_LENGTH + 1
+
+_VALUES = {char: index for index, char in enumerate(ALPHABET)}
+_TYPO_MAP = str.maketrans({"I": "1", "L": "1", "O": "0"})
+
+
+def encode_base32(number):
+    """Encode a non-negative int with the Crockford alphabet."""
+    if number == 0:
+        return ALPHABET[0]
+    out = []
+    while number:
+        number, rem = divmod(number, 32)
+        out.append(ALPHABET[rem])
+    return "".join(reversed(out))
+
+
+def decode_base32(text):
+    """Decode a Crockford base32 string; raises ValueError if invalid."""
+    number = 0
+    for char in normalize_code(text):
+        if char not in _VALUES:
+            raise ValueError(f"Invalid base32 symbol: {char!r}")
+        number = number * 32 + _VALUES[char]
+    return number
+
+
+def check_symbol(body):
+    """Return the Luhn mod 32 check symbol for a code body."""
+    total = 0
+    factor = 2
+    for char in reversed(body):
+        addend = factor * _VALUES[char]
+        total += addend // 32 + addend % 32
+        factor = 1 if factor == 2 else 2
+    return ALPHABET[(32 - total % 32) % 32]
+
+
+def normalize_code(raw):
+    """Uppercase, strip separators and map I/L/O to 1/0."""
+    cleaned = (raw or "").strip().upper().replace("-", "").replace(" ", "")
+    return cleaned.translate(_TYPO_MAP)
+
+
+def is_valid_code(raw):
+    """True when raw normalises to a well-formed code with a valid check."""
+    code = normalize_code(raw)
+    if len(code) != CODE_LENGTH or any(c not in _VALUES for c in code):
+        return False
+    return check_symbol(code[:-1]) == code[-1]
+
+
+def generate_voucher_code():
+    """Return a new random voucher code from the OS CSPRNG."""
+    body = "".join(secrets.choice(ALPHABET) for _ in range(BODY_LENGTH))
+    return body + check_symbol(body)
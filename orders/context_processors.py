@@ -1,8 +1,24 @@
+from django.conf import settings
+
+from .cart import cart_summary
+
+
 def cart_total(request):
     """
-    Make the cart total (€) available to all templates.
+    Make the cart total (€) and item count available to all templates.
+
+    Both values are callables, so the session is only read when a template
+    actually renders them, and then only the summary maintained by
+    store_cart is used. Visitors without a session cookie have no cart, so
+    they never touch the session store at all.
     """
-    cart = request.session.get("cart", {})
-    total = sum(float(item["price"]) * item["quantity"]
-                for item in cart.values())
-    return {"cart_total": total}
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return {"cart_total": 0, "cart_count": 0}
+
+    def total():
+        return float(cart_summary(request.session)["total"])
+
+    def count():
+        return cart_summary(request.session)["count"]
+
+    return {"cart_total": total, "cart_count": count}
@@ -0,0 +1,132 @@
+"""Shared change feed behind the staff live dashboard.
+
+Redemption events and paid orders both have monotonic primary keys, so the
+feed only needs ``id > last_seen`` queries. A single process-wide
+ActivityFeed runs those queries at most once per tick and keeps recent
+events in a ring buffer; every open dashboard stream reads from the buffer,
+so N viewers cost the same database work as one.
+"""
+
+import threading
+import time
+from collections import deque, namedtuple
+
+from django.conf import settings
+from django.db.models import Max
+
+from .models import Order, RedemptionEvent
+
+BATCH_LIMIT = 200  # rows fetched per table per tick
+
+FeedEvent = namedtuple("FeedEvent", "kind cursor data")
+
+
+def tick_seconds():
+    return getattr(settings, "DASHBOARD_TICK_SECONDS", 2)
+
+
+def format_cursor(cursor):
+    return f"{cursor[0]}:{cursor[1]}"
+
+
+def parse_cursor(raw):
+    """Parse a "<redemption_id>:<order_id>" cursor; None if malformed."""
+    try:
+        redemption_id, order_id = (int(part) for part in raw.split(":"))
+    except (AttributeError, ValueError):
+        return None
+    return redemption_id, order_id
+
+
+class ActivityFeed:
+    """Process-wide ring buffer of recent redemption and sale events."""
+
+    def __init__(self, size=500):
+        self.events = deque(maxlen=size)
+        self.cursor = None  # (last redemption id, last order id)
+        self.last_poll = 0.0
+        self.lock = threading.Lock()
+
+    def poll(self):
+        """Fetch new rows if a tick has elapsed since the last poll."""
+        with self.lock:
+            now = time.monotonic()
+            recent = now - self.last_poll < tick_seconds()
+            if self.cursor is not None and recent:
+                return
+            self.last_poll = now
+
+            if self.cursor is None:
+                # Start from the current head; history is not replayed.
+                self.cursor = (
+                    RedemptionEvent.objects.aggregate(m=Max("id"))["m"] or 0,
+                    Order.objects.aggregate(m=Max("id"))["m"] or 0,
+                )
+                return
+
+            redemption_id, order_id = self.cursor
+            redemptions = (
+                RedemptionEvent.objects.filter(id__gt=redemption_id)
+                .order_by("id")
+                .values(
+                    "id",
+                    "code",
+                    "outcome",
+                    "created_at",
+                    "staff__username",
+                    "voucher__service__name",
+                )[:BATCH_LIMIT]
+            )
+            for row in redemptions:
+                redemption_id = row["id"]
+                self.events.append(
+                    FeedEvent(
+                        "redemption",
+                        (redemption_id, order_id),
+                        {
+                            "code": row["code"],
+                            "outcome": row["outcome"],
+                            "service": row["voucher__service__name"],
+                            "staff": row["staff__username"],
+                            "at": row["created_at"].isoformat(),
+                        },
+                    )
+                )
+
+            sales = (
+                Order.objects.filter(id__gt=order_id, is_paid=True)
+                .order_by("id")
+                .values("id", "created_at", "user__username")[:BATCH_LIMIT]
+            )
+            for row in sales:
+                order_id = row["id"]
+                self.events.append(
+                    FeedEvent(
+                        "sale",
+                        (redemption_id, order_id),
+                        {
+                            "order": order_id,
+                            "customer": row["user__username"],
+                            "at": row["created_at"].isoformat(),
+                        },
+                    )
+                )
+            self.cursor = (redemption_id, order_id)
+
+    def since(self, cursor):
+        """Return (events newer than cursor, the feed's current cursor)."""
+        self.poll()
+        with self.lock:
+            head = self.cursor
+            if cursor is None:
+                return [], head
+            fresh = [
+                event
+                for event in self.events
+                if (event.kind == "redemption" and event.cursor[0] > cursor[0])
+                or (event.kind == "sale" and event.cursor[1] > cursor[1])
+            ]
+        return fresh, head
+
+
+activity_feed = ActivityFeed()
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from services.models import Service
+
+MODES = {
+    "db": {
+        "SESSION_ENGINE": "django.contrib.sessions.backends.db",
+        "MESSAGE_STORAGE": (
+            "django.contrib.messages.storage.session.SessionStorage"
+        ),
+    },
+    "cache": {
+        "SESSION_ENGINE": "django.contrib.sessions.backends.cached_db",
+        "MESSAGE_STORAGE": (
+            "django.contrib.messages.storage.fallback.FallbackStorage"
+        ),
+    },
+    "cookie": {
+        "SESSION_ENGINE": "django.contrib.sessions.backends.signed_cookies",
+        "MESSAGE_STORAGE": (
+            "django.contrib.messages.storage.cookie.CookieStorage"
+        ),
+    },
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def session_queries(queries):
+    """Return (reads, writes) against django_session in captured queries."""
+    reads = writes = 0
+    for q in queries:
+        sql = q["sql"].lstrip().upper()
+        if "DJANGO_SESSION" not in sql:
+            continue
+        if sql.startswith("SELECT"):
+            reads += 1
+        else:
+            writes += 1
+    return reads, writes
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a browse/add-to-cart/checkout-page flow under each SESSION_MODE "
+        "and report django_session reads/writes per page view. Runs inside a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=5,
+            help="How many times to repeat the flow per mode.",
+        )
+
+    def flow(self, client, service):
+        """Yield one response per page view of a typical shopping visit."""
+        yield client.get(reverse("services:service_list"))
+        yield client.get(
+            reverse("services:service_detail", args=[service.slug])
+        )
+        yield client.post(
+            reverse("orders:add_to_cart"),
+            {"service_id": service.id, "quantity": 1},
+        )
+        yield client.get(reverse("orders:cart"))  # shows the flash message
+        yield client.get(reverse("services:service_list"))
+        yield client.get(reverse("orders:cart"))
+
+    def handle(self, *args, **opts):
+        rounds = max(opts["rounds"], 1)
+        service = Service.objects.filter(is_active=True).first()
+        if service is None:
+            self.stdout.write(self.style.ERROR("No active services to browse."))
+            return
+
+        results = {}
+        try:
+            with transaction.atomic():
+                user = get_user_model().objects.create_user(
+                    username="bench-session-user", password="unused-pass-123"
+                )
+                for mode, overrides in MODES.items():
+                    with override_settings(
+                        ALLOWED_HOSTS=["testserver"], **overrides
+                    ):
+                        views = reads = writes = 0
+                        for _ in range(rounds):
+                            client = Client()
+                            client.force_login(user)
+                            with CaptureQueriesContext(connection) as ctx:
+                                views += sum(1 for _ in self.flow(client, service))
+                            r, w = session_queries(ctx.captured_queries)
+                            reads += r
+                            writes += w
+                        results[mode] = (views, reads, writes)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(
+            f"{'mode':<8}{'views':>7}{'reads':>8}{'writes':>8}{'writes/view':>13}"
+        )
+        for mode, (views, reads, writes) in results.items():
+            self.stdout.write(
+                f"{mode:<8}{views:>7}{reads:>8}{writes:>8}{writes / views:>13.2f}"
+            )
+        db_writes = results["db"][2]
+        cookie_writes = results["cookie"][2]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"cookie mode removes {db_writes - cookie_writes} of "
+                f"{db_writes} django_session writes."
+            )
+        )
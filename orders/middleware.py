@@ -0,0 +1,17 @@
+"""Request middleware for the orders app."""
+
+from .audit import RedemptionAuditBuffer
+
+
+class RedemptionAuditMiddleware:
+    """Attach a redemption audit buffer to each request and flush it once."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.redemption_audit = RedemptionAuditBuffer()
+        try:
+            return self.get_response(request)
+        finally:
+            request.redemption_audit.flush()
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_stripe_session_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RedemptionEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=64)),
+                ('outcome', models.CharField(choices=[('REDEEMED', 'REDEEMED'), ('ALREADY_USED', 'ALREADY_USED'), ('NOT_FOUND', 'NOT_FOUND'), ('INVALID_TOKEN', 'INVALID_TOKEN'), ('EXPIRED_TOKEN', 'EXPIRED_TOKEN'), ('DENIED', 'DENIED')], max_length=20)),
+                ('device', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('staff', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='redemption_events', to=settings.AUTH_USER_MODEL)),
+                ('voucher', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='redemption_events', to='orders.voucher')),
+            ],
+            options={
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['outcome', 'created_at', 'staff'], name='orders_redemption_report_idx')],
+            },
+        ),
+    ]
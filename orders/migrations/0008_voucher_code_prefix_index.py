@@ -0,0 +1,38 @@
+from django.db import migrations
+
+INDEX_NAME = "orders_voucher_code_iprefix"
+
+CREATE_SQL = {
+    # Matches Django's istartswith SQL: UPPER("code"::text) LIKE UPPER(%s)
+    "postgresql": (
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} "
+        "ON orders_voucher (UPPER(code::text) text_pattern_ops)"
+    ),
+    # SQLite's LIKE is case-insensitive; it can only use a NOCASE index.
+    "sqlite": (
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} "
+        "ON orders_voucher (code COLLATE NOCASE)"
+    ),
+}
+
+
+def create_index(apps, schema_editor):
+    sql = CREATE_SQL.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_SQL:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_redemptionevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
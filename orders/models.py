@@ -14,6 +14,15 @@ VOUC_STATUS = [
     ("EXPIRED", "EXPIRED")
 ]
 
+REDEMPTION_OUTCOMES = [
+    ("REDEEMED", "REDEEMED"),
+    ("ALREADY_USED", "ALREADY_USED"),
+    ("NOT_FOUND", "NOT_FOUND"),
+    ("INVALID_TOKEN", "INVALID_TOKEN"),
+    ("EXPIRED_TOKEN", "EXPIRED_TOKEN"),
+    ("DENIED", "DENIED"),
+]
+
 User = get_user_model()
 
 
@@ -65,3 +74,42 @@ class Voucher(models.Model):
 
     class Meta:
         ordering = ['-issued_at']
+
+
+class RedemptionEvent(models.Model):
+    """
+    Append-only audit record of a redemption attempt (successful or not).
+    Rows are written in batches by orders.audit.RedemptionAuditBuffer.
+    """
+
+    voucher = models.ForeignKey(
+        Voucher,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="redemption_events",
+    )
+    code = models.CharField(max_length=64)
+    staff = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="redemption_events",
+    )
+    outcome = models.CharField(choices=REDEMPTION_OUTCOMES, max_length=20)
+    device = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [
+            # Backs the per-hour, per-staff redemption report.
+            models.Index(
+                fields=["outcome", "created_at", "staff"],
+                name="orders_redemption_report_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.code} {self.outcome} @ {self.created_at:%Y-%m-%d %H:%M}"
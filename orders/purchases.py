@@ -0,0 +1,87 @@
+"""Cached per-user set of purchased service ids.
+
+Review eligibility ("has this user bought the service?") is asked on every
+service_detail view and review POST. The answer is one frozenset per user,
+read with a single values_list query and cached under a per-user version
+key. Voucher saves and deletes bump the version (again on commit), so a
+set computed before the new voucher was visible is never read again.
+Without a shared cache the bump only reaches the worker that issued the
+voucher, so sets expire quickly and has_purchased() re-checks a cached
+"no" against the database.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.caching import cache_timeout
+
+from .models import Voucher
+
+PURCHASES_TIMEOUT = 60 * 60 * 24
+LOCAL_PURCHASES_TIMEOUT = 30
+
+
+def _version_key(user_id):
+    return f"orders:purchases-version:{user_id}"
+
+
+def purchases_version(user_id):
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted key never reuses an old version.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_purchases_version(user_id):
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), time.time_ns(), None)
+
+
+def purchases_changed(user_id):
+    """Invalidate now and again once the current transaction commits."""
+    bump_purchases_version(user_id)
+    transaction.on_commit(lambda: bump_purchases_version(user_id))
+
+
+def purchased_service_ids(user):
+    """Return a frozenset of service ids the user holds vouchers for."""
+    if not user.is_authenticated:
+        return frozenset()
+    key = f"orders:purchases:{user.pk}:{purchases_version(user.pk)}"
+    service_ids = cache.get(key)
+    if service_ids is None:
+        service_ids = frozenset(
+            Voucher.objects.filter(user_id=user.pk)
+            .order_by()
+            .values_list("service_id", flat=True)
+            .distinct()
+        )
+        cache.set(
+            key, service_ids,
+            cache_timeout(PURCHASES_TIMEOUT, LOCAL_PURCHASES_TIMEOUT),
+        )
+    return service_ids
+
+
+def has_purchased(user, service_id):
+    """
+    Authoritative check for writes: trust a cached "yes", but confirm a
+    cached "no" with the database in case the set predates a voucher.
+    """
+    if service_id in purchased_service_ids(user):
+        return True
+    if not user.is_authenticated:
+        return False
+    bought = Voucher.objects.filter(
+        user_id=user.pk, service_id=service_id
+    ).exists()
+    if bought:
+        bump_purchases_version(user.pk)
+    return bought
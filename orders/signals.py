@@ -0,0 +1,18 @@
+"""Signal handlers that keep cached order data in step with the DB."""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Voucher
+from .purchases import purchases_changed
+
+
+@receiver(post_save, sender=Voucher)
+def voucher_saved(sender, instance, created, **kwargs):
+    if created:
+        purchases_changed(instance.user_id)
+
+
+@receiver(post_delete, sender=Voucher)
+def voucher_deleted(sender, instance, **kwargs):
+    purchases_changed(instance.user_id)
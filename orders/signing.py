@@ -0,0 +1,81 @@
+"""Signed voucher tokens that can be verified without a database lookup.
+
+A token packs the voucher code, service id and expiry together with a
+truncated HMAC, e.g. ``7KQ2M9XW4HRT5.1A.1PZ0X3K.DT9WQ0XM4H7RB``. Every part
+uses the Crockford base32 alphabet so the token stays QR-alphanumeric.
+The scan views check the signature and expiry first, so forged or expired
+codes are rejected before the voucher table is touched.
+"""
+
+import hashlib
+import hmac
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.signing import BadSignature, SignatureExpired
+from django.utils import timezone
+
+from .codes import decode_base32, encode_base32, normalize_code
+
+TOKEN_SALT = "orders.voucher-token"
+SIGNATURE_BYTES = 8  # 64-bit truncated HMAC-SHA256
+
+VoucherClaims = namedtuple("VoucherClaims", "code service_id expires_at")
+
+
+def _signing_key():
+    """Derive the HMAC key from VOUCHER_TOKEN_KEY (or SECRET_KEY)."""
+    secret = getattr(settings, "VOUCHER_TOKEN_KEY", "") or settings.SECRET_KEY
+    return hashlib.sha256(f"{TOKEN_SALT}:{secret}".encode("utf-8")).digest()
+
+
+def _signature(payload):
+    """Return the truncated, base32-encoded HMAC for a token payload."""
+    digest = hmac.new(
+        _signing_key(), payload.encode("utf-8"), hashlib.sha256
+    ).digest()[:SIGNATURE_BYTES]
+    return encode_base32(int.from_bytes(digest, "big"))
+
+
+def make_voucher_token(voucher):
+    """Build a signed token for a voucher (code, service id and expiry)."""
+    expires = int(voucher.expires_at.timestamp())
+    payload = ".".join(
+        [
+            voucher.code,
+            encode_base32(voucher.service_id),
+            encode_base32(expires),
+        ]
+    )
+    return f"{payload}.{_signature(payload)}"
+
+
+def read_voucher_token(token, now=None):
+    """
+    Verify a voucher token and return its VoucherClaims.
+
+    Raises BadSignature for malformed or forged tokens and SignatureExpired
+    once the embedded expiry has passed. No database queries are made.
+    """
+    if not isinstance(token, str):
+        # Tokens arrive in JSON bodies, where any type can appear.
+        raise BadSignature("Malformed voucher token.")
+    try:
+        payload, signature = token.rsplit(".", 1)
+        code, service_part, expiry_part = payload.rsplit(".", 2)
+        service_id = decode_base32(service_part)
+        expires = decode_base32(expiry_part)
+    except ValueError:
+        raise BadSignature("Malformed voucher token.")
+
+    if not code or not hmac.compare_digest(
+        normalize_code(signature), _signature(payload)
+    ):
+        raise BadSignature("Voucher token signature does not match.")
+
+    expires_at = datetime.fromtimestamp(expires, tz=dt_timezone.utc)
+    if expires_at <= (now or timezone.now()):
+        raise SignatureExpired("Voucher token has expired.")
+
+    return VoucherClaims(code, service_id, expires_at)
@@ -1,16 +1,33 @@
+import json
 import os
 import shutil
 import tempfile
+from datetime import timedelta
 from types import SimpleNamespace
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase, override_settings
+from django.core.files.storage import default_storage
+from django.core.signing import BadSignature, SignatureExpired
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
 from services.models import ServiceCategory, Service
-from .models import Order, OrderItem, Voucher
+from .audit import RedemptionAuditBuffer, redemptions_per_hour
+from .cart import SUMMARY_SESSION_KEY, Cart
+from .codes import (
+    CODE_LENGTH,
+    generate_voucher_code,
+    is_valid_code,
+    normalize_code,
+)
+from .context_processors import cart_total
+from .feed import ActivityFeed, activity_feed
+from .models import Order, OrderItem, RedemptionEvent, Voucher
+from .signing import make_voucher_token, read_voucher_token
 
 User = get_user_model()
 
@@ -134,6 +151,7 @@ class OrderViewsTests(TestCase):
         self.assertEqual(vouchers.count(), 1)
         self.assertTrue(all(v.status == "ISSUED" for v in vouchers))
         self.assertTrue(all(v.qr_img_path.name for v in vouchers))
+        self.assertTrue(all(is_valid_code(v.code) for v in vouchers))
 
     @patch("stripe.Webhook.construct_event")
     def test_webhook_is_idempotent(self, mock_construct_event):
@@ -515,3 +533,771 @@ class OrderViewsTests(TestCase):
             reverse("orders:scan_voucher", args=["nocode"])
         )
         self.assertEqual(response.status_code, 404)
+
+
+class VoucherTokenTests(TestCase):
+    """Covers signed voucher tokens and the offline redemption sync."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="tokenuser", email="token@example.com", password="pass1234"
+        )
+        self.staff = User.objects.create_user(
+            username="tokenstaff",
+            email="tokenstaff@example.com",
+            password="pass1234",
+            is_staff=True,
+        )
+        category = ServiceCategory.objects.create(name="Passes", slug="passes")
+        self.service = Service.objects.create(
+            category=category,
+            name="Day Care",
+            slug="day-care",
+            description="Great care",
+            price=12.34,
+        )
+        order = Order.objects.create(user=self.user, is_paid=True)
+        self.order_item = OrderItem.objects.create(
+            order=order, service=self.service, quantity=1, price=12.34
+        )
+        self.voucher = self._voucher("tokencode")
+
+    def _voucher(self, code, **kwargs):
+        return Voucher.objects.create(
+            service=self.service,
+            order_item=self.order_item,
+            user=self.user,
+            code=code,
+            status=kwargs.pop("status", "ISSUED"),
+            **kwargs,
+        )
+
+    def test_token_round_trip_without_queries(self):
+        token = make_voucher_token(self.voucher)
+        with self.assertNumQueries(0):
+            claims = read_voucher_token(token)
+        self.assertEqual(claims.code, "tokencode")
+        self.assertEqual(claims.service_id, self.service.id)
+
+    def test_tampered_token_rejected(self):
+        token = make_voucher_token(self.voucher)
+        forged = token.replace("tokencode", "othercode")
+        with self.assertRaises(BadSignature):
+            read_voucher_token(forged)
+        with self.assertRaises(BadSignature):
+            read_voucher_token("not-a-token")
+        for not_a_string in (None, 5, ["a.b"], {"token": "x"}):
+            with self.assertRaises(BadSignature):
+                read_voucher_token(not_a_string)
+
+    def test_expired_token_rejected(self):
+        voucher = self._voucher(
+            "oldcode", expires_at=timezone.now() - timedelta(days=1)
+        )
+        with self.assertRaises(SignatureExpired):
+            read_voucher_token(make_voucher_token(voucher))
+
+    def test_scan_token_rejects_forgery(self):
+        self.client.login(username="tokenstaff", password="pass1234")
+        response = self.client.get(
+            reverse("orders:scan_token", args=["tokencode.1.abc.AAAA"])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_scan_token_shows_voucher(self):
+        self.client.login(username="tokenstaff", password="pass1234")
+        response = self.client.get(
+            reverse(
+                "orders:scan_token", args=[make_voucher_token(self.voucher)]
+            )
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "tokencode")
+
+    def test_offline_sync_redeems_in_bulk(self):
+        used = self._voucher("usedcode", status="REDEEMED")
+        payload = {
+            "redemptions": [
+                {"token": make_voucher_token(self.voucher)},
+                {"token": make_voucher_token(used)},
+                {"token": "forged.1.abc.AAAA"},
+            ]
+        }
+        self.client.login(username="tokenstaff", password="pass1234")
+        response = self.client.post(
+            reverse("orders:sync_offline_redemptions"),
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["redeemed"], ["tokencode"])
+        self.assertEqual(data["already_used"], ["usedcode"])
+        self.assertEqual(data["rejected"][0]["reason"], "invalid")
+        self.voucher.refresh_from_db()
+        self.assertEqual(self.voucher.status, "REDEEMED")
+        self.assertIsNotNone(self.voucher.redeemed_at)
+
+    def test_offline_sync_rejects_non_string_tokens(self):
+        self.client.login(username="tokenstaff", password="pass1234")
+        response = self.client.post(
+            reverse("orders:sync_offline_redemptions"),
+            data=json.dumps({"redemptions": [{"token": 5}]}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["rejected"][0]["reason"], "invalid")
+
+    def test_offline_sync_checks_expiry_at_scan_time(self):
+        scanned_at = timezone.now() - timedelta(hours=2)
+        voucher = self._voucher(
+            "latecode", expires_at=timezone.now() - timedelta(hours=1)
+        )
+        payload = {
+            "redemptions": [
+                {
+                    "token": make_voucher_token(voucher),
+                    "redeemed_at": scanned_at.isoformat(),
+                }
+            ]
+        }
+        self.client.login(username="tokenstaff", password="pass1234")
+        response = self.client.post(
+            reverse("orders:sync_offline_redemptions"),
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["redeemed"], ["latecode"])
+        voucher.refresh_from_db()
+        self.assertEqual(voucher.status, "REDEEMED")
+        self.assertEqual(voucher.redeemed_at, scanned_at)
+        event = RedemptionEvent.objects.get(code="latecode")
+        self.assertEqual(event.created_at, scanned_at)
+
+    def test_offline_sync_clamps_backdated_scans(self):
+        voucher = self._voucher(
+            "oldscan", expires_at=timezone.now() - timedelta(days=3)
+        )
+        payload = {
+            "redemptions": [
+                {
+                    "token": make_voucher_token(voucher),
+                    "redeemed_at": (
+                        timezone.now() - timedelta(days=7)
+                    ).isoformat(),
+                }
+            ]
+        }
+        self.client.login(username="tokenstaff", password="pass1234")
+        response = self.client.post(
+            reverse("orders:sync_offline_redemptions"),
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["rejected"][0]["reason"], "expired")
+        voucher.refresh_from_db()
+        self.assertEqual(voucher.status, "ISSUED")
+
+    def test_offline_sync_requires_staff(self):
+        self.client.login(username="tokenuser", password="pass1234")
+        response = self.client.post(
+            reverse("orders:sync_offline_redemptions"),
+            data="{}",
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 302)
+
+
+class VoucherCodeTests(TestCase):
+    """Covers the compact Crockford base32 voucher code format."""
+
+    def test_generated_codes_are_compact_and_valid(self):
+        codes = {generate_voucher_code() for _ in range(200)}
+        self.assertEqual(len(codes), 200)
+        for code in codes:
+            self.assertEqual(len(code), CODE_LENGTH)
+            self.assertTrue(is_valid_code(code))
+            self.assertNotIn("-", code)
+
+    def test_check_symbol_catches_single_typo(self):
+        code = generate_voucher_code()
+        replacement = "0" if code[3] != "0" else "1"
+        typo = code[:3] + replacement + code[4:]
+        self.assertFalse(is_valid_code(typo))
+
+    def test_normalize_folds_ambiguous_symbols(self):
+        self.assertEqual(normalize_code(" ab-cd io l "), "ABCD101")
+
+    def test_short_scan_route_accepts_token(self):
+        user = User.objects.create_user(
+            username="shortstaff",
+            email="shortstaff@example.com",
+            password="pass1234",
+            is_staff=True,
+        )
+        category = ServiceCategory.objects.create(name="Passes", slug="passes")
+        service = Service.objects.create(
+            category=category,
+            name="Day Care",
+            slug="day-care",
+            description="Great care",
+            price=10,
+        )
+        order = Order.objects.create(user=user, is_paid=True)
+        order_item = OrderItem.objects.create(
+            order=order, service=service, quantity=1, price=10
+        )
+        voucher = Voucher.objects.create(
+            service=service,
+            order_item=order_item,
+            user=user,
+            code=generate_voucher_code(),
+            status="ISSUED",
+        )
+        self.client.login(username="shortstaff", password="pass1234")
+        response = self.client.get(
+            reverse("short_scan", args=[make_voucher_token(voucher)])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, voucher.code)
+
+
+class RedemptionAuditTests(TestCase):
+    """Covers the buffered redemption audit log and its hourly report."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="audituser", email="audit@example.com", password="pass1234"
+        )
+        self.staff = User.objects.create_user(
+            username="auditstaff",
+            email="auditstaff@example.com",
+            password="pass1234",
+            is_staff=True,
+        )
+        category = ServiceCategory.objects.create(name="Passes", slug="passes")
+        self.service = Service.objects.create(
+            category=category,
+            name="Day Care",
+            slug="day-care",
+            description="Great care",
+            price=10,
+        )
+        order = Order.objects.create(user=self.user, is_paid=True)
+        order_item = OrderItem.objects.create(
+            order=order, service=self.service, quantity=1, price=10
+        )
+        self.voucher = Voucher.objects.create(
+            service=self.service,
+            order_item=order_item,
+            user=self.user,
+            code="auditcode",
+            status="ISSUED",
+        )
+
+    def test_scan_records_success_and_failed_attempts(self):
+        url = reverse("orders:scan_voucher", args=["auditcode"])
+        self.client.login(username="audituser", password="pass1234")
+        self.client.post(url)
+        self.client.login(username="auditstaff", password="pass1234")
+        self.client.post(url, HTTP_X_SCANNER_DEVICE="front-desk-ipad")
+        self.client.post(url)
+        self.client.post(reverse("orders:scan_voucher", args=["missing"]))
+
+        events = list(RedemptionEvent.objects.order_by("id"))
+        self.assertEqual(
+            [e.outcome for e in events],
+            ["DENIED", "REDEEMED", "ALREADY_USED", "NOT_FOUND"],
+        )
+        self.assertEqual(events[1].staff, self.staff)
+        self.assertEqual(events[1].device, "front-desk-ipad")
+        self.assertEqual(events[1].voucher, self.voucher)
+
+    def test_buffer_flushes_with_one_insert(self):
+        buffer = RedemptionAuditBuffer(flush_at=100)
+        for _ in range(5):
+            buffer.add(code="auditcode", outcome="REDEEMED", staff=self.staff)
+        self.assertEqual(RedemptionEvent.objects.count(), 0)
+        with self.assertNumQueries(1):
+            self.assertEqual(buffer.flush(), 5)
+        self.assertEqual(RedemptionEvent.objects.count(), 5)
+
+    def test_buffer_flushes_early_when_full(self):
+        buffer = RedemptionAuditBuffer(flush_at=2)
+        buffer.add(code="a", outcome="NOT_FOUND")
+        buffer.add(code="b", outcome="NOT_FOUND")
+        self.assertEqual(RedemptionEvent.objects.count(), 2)
+        self.assertEqual(buffer.pending, [])
+
+    def test_redemptions_per_hour_groups_by_staff(self):
+        now = timezone.now().replace(minute=30, second=0, microsecond=0)
+        RedemptionEvent.objects.bulk_create(
+            [
+                RedemptionEvent(
+                    code="x", outcome="REDEEMED", staff=self.staff,
+                    created_at=now,
+                ),
+                RedemptionEvent(
+                    code="y", outcome="REDEEMED", staff=self.staff,
+                    created_at=now + timedelta(minutes=5),
+                ),
+                RedemptionEvent(
+                    code="z", outcome="NOT_FOUND", staff=self.staff,
+                    created_at=now,
+                ),
+                RedemptionEvent(
+                    code="w", outcome="REDEEMED", staff=self.staff,
+                    created_at=now + timedelta(hours=1),
+                ),
+            ]
+        )
+        rows = list(
+            redemptions_per_hour(
+                now - timedelta(hours=1), now + timedelta(hours=2)
+            )
+        )
+        self.assertEqual([row["total"] for row in rows], [2, 1])
+        self.assertEqual(rows[0]["staff__username"], "auditstaff")
+
+
+class StaffDashboardTests(TestCase):
+    """Covers the shared activity feed and the SSE dashboard stream."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username="dashstaff",
+            email="dashstaff@example.com",
+            password="pass1234",
+            is_staff=True,
+        )
+
+    @override_settings(DASHBOARD_TICK_SECONDS=60)
+    def test_feed_polls_once_per_tick_for_all_viewers(self):
+        feed = ActivityFeed()
+        with self.assertNumQueries(2):
+            feed.poll()  # primes cursors at the current head
+        start = feed.cursor
+        RedemptionEvent.objects.create(
+            code="feedcode", outcome="REDEEMED", staff=self.staff
+        )
+        Order.objects.create(user=self.staff, is_paid=True)
+
+        feed.last_poll = 0.0  # let the next tick through
+        with self.assertNumQueries(2):
+            events, head = feed.since(start)
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                other_events, _head = feed.since(start)
+        self.assertEqual([e.kind for e in events], ["redemption", "sale"])
+        self.assertEqual(other_events, events)
+        self.assertEqual(feed.since(head)[0], [])
+
+    @override_settings(DASHBOARD_TICK_SECONDS=0, DASHBOARD_STREAM_SECONDS=0)
+    def test_stream_emits_server_sent_events(self):
+        activity_feed.cursor = None
+        activity_feed.events.clear()
+        activity_feed.poll()
+        start = activity_feed.cursor
+        RedemptionEvent.objects.create(
+            code="streamcode", outcome="REDEEMED", staff=self.staff
+        )
+
+        self.client.login(username="dashstaff", password="pass1234")
+        response = self.client.get(
+            reverse("orders:staff_dashboard_stream"),
+            HTTP_LAST_EVENT_ID=f"{start[0]}:{start[1]}",
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join(response.streaming_content).decode()
+        self.assertIn("event: redemption", body)
+        self.assertIn("streamcode", body)
+
+    @override_settings(DASHBOARD_STREAM_SECONDS=300)
+    def test_stream_ends_before_the_worker_timeout(self):
+        self.client.login(username="dashstaff", password="pass1234")
+        with patch(
+            "orders.views.dashboard_events", return_value=iter([])
+        ) as events:
+            self.client.get(reverse("orders:staff_dashboard_stream"))
+        self.assertEqual(events.call_args.args[1], 25)
+
+    def test_dashboard_requires_staff(self):
+        User.objects.create_user(
+            username="dashuser", email="dashuser@example.com", password="pass1234"
+        )
+        self.client.login(username="dashuser", password="pass1234")
+        response = self.client.get(reverse("orders:staff_dashboard"))
+        self.assertEqual(response.status_code, 302)
+        self.client.login(username="dashstaff", password="pass1234")
+        response = self.client.get(reverse("orders:staff_dashboard"))
+        self.assertEqual(response.status_code, 200)
+
+
+class VoucherLookupTests(TestCase):
+    """Covers the staff prefix lookup for partially readable codes."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username="lookupstaff",
+            email="lookupstaff@example.com",
+            password="pass1234",
+            is_staff=True,
+        )
+        category = ServiceCategory.objects.create(name="Passes", slug="passes")
+        service = Service.objects.create(
+            category=category,
+            name="Day Care",
+            slug="day-care",
+            description="Great care",
+            price=10,
+        )
+        order = Order.objects.create(user=self.staff, is_paid=True)
+        order_item = OrderItem.objects.create(
+            order=order, service=service, quantity=12, price=10
+        )
+        codes = [f"ABC{n:02d}XYZ" for n in range(12)] + ["abd-legacy"]
+        for code in codes:
+            Voucher.objects.create(
+                service=service,
+                order_item=order_item,
+                user=self.staff,
+                code=code,
+                status="ISSUED",
+            )
+
+    def _lookup(self, query):
+        return self.client.get(
+            reverse("orders:voucher_lookup"), {"q": query}
+        ).json()["results"]
+
+    def test_prefix_lookup_is_case_insensitive_and_capped(self):
+        self.client.login(username="lookupstaff", password="pass1234")
+        results = self._lookup("abc0")
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(r["code"].startswith("ABC0") for r in results))
+        self.assertEqual(results[0]["service"], "Day Care")
+        self.assertEqual(results[0]["status"], "ISSUED")
+        self.assertEqual(len(self._lookup("ABC11")), 1)
+
+    def test_prefix_lookup_handles_legacy_codes_and_short_queries(self):
+        self.client.login(username="lookupstaff", password="pass1234")
+        self.assertEqual(
+            [r["code"] for r in self._lookup("ABD-LEG")], ["abd-legacy"]
+        )
+        self.assertEqual(self._lookup("ab"), [])
+
+    def test_prefix_lookup_requires_staff(self):
+        response = self.client.get(reverse("orders:voucher_lookup"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_prefix_lookup_uses_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("query plan check is SQLite-specific")
+        sql, params = (
+            Voucher.objects.filter(code__istartswith="ABC")
+            .order_by()
+            .values("code")
+            .query.sql_with_params()
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = " ".join(str(row) for row in cursor.fetchall())
+        self.assertIn("orders_voucher_code_iprefix", plan)
+
+
+class CartSummaryTests(TestCase):
+    """Covers the maintained cart summary and the cart_total processor."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="cartuser", email="cart@example.com", password="pass1234"
+        )
+        category = ServiceCategory.objects.create(name="Passes", slug="passes")
+        self.service = Service.objects.create(
+            category=category,
+            name="Day Care",
+            slug="day-care",
+            description="Great care",
+            price=12.34,
+        )
+
+    def test_anonymous_without_cookie_skips_session(self):
+        request = RequestFactory().get("/")
+
+        class ExplodingSession(dict):
+            def get(self, *args, **kwargs):
+                raise AssertionError("session should not be read")
+
+        request.session = ExplodingSession()
+        with self.assertNumQueries(0):
+            context = cart_total(request)
+        self.assertEqual(context, {"cart_total": 0, "cart_count": 0})
+
+    def test_summary_maintained_on_cart_changes(self):
+        self.client.login(username="cartuser", password="pass1234")
+        self.client.post(
+            reverse("orders:add_to_cart"),
+            {"service_id": self.service.id, "quantity": 2},
+        )
+        self.assertEqual(
+            self.client.session[SUMMARY_SESSION_KEY],
+            {"count": 2, "total": "24.68"},
+        )
+        response = self.client.get(reverse("orders:cart"))
+        self.assertEqual(response.context["cart_total"](), 24.68)
+        self.assertEqual(response.context["cart_count"](), 2)
+
+        self.client.get(
+            reverse("orders:remove_from_cart", args=[str(self.service.id)])
+        )
+        self.assertNotIn(SUMMARY_SESSION_KEY, self.client.session)
+
+
+def session_writes(queries):
+    """Count INSERT/UPDATE statements against django_session."""
+    return sum(
+        1
+        for q in queries
+        if "django_session" in q["sql"]
+        and q["sql"].lstrip().upper().startswith(("INSERT", "UPDATE"))
+    )
+
+
+class CartApiTests(TestCase):
+    """Covers the Cart service object and the JSON cart endpoint."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="apiuser", email="api@example.com", password="pass1234"
+        )
+        category = ServiceCategory.objects.create(name="Passes", slug="passes")
+        self.service = Service.objects.create(
+            category=category,
+            name="Day Care",
+            slug="day-care",
+            description="Great care",
+            price=10,
+        )
+
+    def _post(self, **data):
+        return self.client.post(reverse("orders:cart_api"), data)
+
+    def test_api_add_update_remove_returns_totals(self):
+        self.client.login(username="apiuser", password="pass1234")
+        response = self._post(action="add", service_id=self.service.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["total"], "10.00")
+
+        response = self._post(
+            action="update", service_id=self.service.id, quantity=3
+        )
+        self.assertEqual(response.json()["count"], 3)
+        self.assertEqual(response.json()["total"], "30.00")
+
+        response = self._post(action="remove", service_id=self.service.id)
+        self.assertEqual(response.json()["count"], 0)
+        self.assertNotIn("cart", self.client.session)
+
+    def test_api_rejects_bad_input(self):
+        self.client.login(username="apiuser", password="pass1234")
+        self.assertEqual(
+            self._post(action="add", service_id=999).status_code, 404
+        )
+        self.assertEqual(
+            self._post(
+                action="add", service_id=self.service.id, quantity="x"
+            ).status_code,
+            400,
+        )
+        self.assertEqual(
+            self._post(action="remove", service_id=self.service.id).status_code,
+            404,
+        )
+
+    def test_api_requires_login(self):
+        response = self._post(action="add", service_id=self.service.id)
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("login_url", response.json())
+
+    def test_add_to_cart_writes_session_once(self):
+        self.client.login(username="apiuser", password="pass1234")
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(
+                reverse("orders:add_to_cart"),
+                {"service_id": self.service.id, "quantity": 1},
+            )
+        self.assertEqual(session_writes(ctx.captured_queries), 1)
+
+    @override_settings(
+        SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies",
+        MESSAGE_STORAGE="django.contrib.messages.storage.cookie.CookieStorage",
+    )
+    def test_cookie_session_mode_skips_session_table(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(
+                reverse("orders:add_to_cart"),
+                {"service_id": self.service.id, "quantity": 2},
+            )
+            response = self.client.get(reverse("orders:cart"))
+        self.assertContains(response, "Added Day Care to your cart.")
+        self.assertEqual(response.context["total_amount"], 20.0)
+        self.assertFalse(
+            any("django_session" in q["sql"] for q in ctx.captured_queries)
+        )
+
+
+class CartRepricingTests(TestCase):
+    """Covers bulk re-pricing and validation of cart lines."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="priceuser", email="price@example.com", password="pass1234"
+        )
+        category = ServiceCategory.objects.create(name="Passes", slug="passes")
+        self.services = [
+            Service.objects.create(
+                category=category,
+                name=f"Pass {n}",
+                slug=f"pass-{n}",
+                description="Great care",
+                price=10 + n,
+            )
+            for n in range(5)
+        ]
+
+    def _session_cart(self, lines):
+        session = self.client.session
+        session["cart"] = lines
+        session.save()
+
+    def test_refresh_uses_one_query_for_many_lines(self):
+        session = {
+            "cart": {
+                str(s.id): {"name": s.name, "price": 1.0, "quantity": 1}
+                for s in self.services
+            }
+        }
+        cart = Cart(session)
+        with self.assertNumQueries(1):
+            changes = cart.refresh()
+        self.assertEqual(len(changes), 5)
+        self.assertEqual(cart.summary["total"], "60.00")
+
+    def test_cart_view_reprices_and_drops_inactive(self):
+        stale, retired = self.services[0], self.services[1]
+        retired.is_active = False
+        retired.save()
+        self._session_cart(
+            {
+                str(stale.id): {"name": "Old", "price": 1.0, "quantity": 2},
+                str(retired.id): {
+                    "name": retired.name, "price": 11.0, "quantity": 1,
+                },
+            }
+        )
+        response = self.client.get(reverse("orders:cart"))
+        self.assertEqual(response.context["total_amount"], 20.0)
+        self.assertEqual(
+            [item["name"] for item in response.context["cart_items"]],
+            ["Pass 0"],
+        )
+        self.assertContains(response, "no longer available")
+        self.assertContains(response, "changed from €1.00 to €10.00")
+        self.assertEqual(
+            self.client.session["cart_summary"], {"count": 2, "total": "20.00"}
+        )
+
+    @patch("stripe.checkout.Session.create")
+    def test_checkout_with_stale_price_returns_to_cart(self, mock_create):
+        self.client.login(username="priceuser", password="pass1234")
+        service = self.services[2]
+        self._session_cart(
+            {
+                str(service.id): {
+                    "name": service.name, "price": 1.0, "quantity": 1,
+                },
+            }
+        )
+        response = self.client.post(reverse("orders:create_checkout_session"))
+        self.assertRedirects(
+            response, reverse("orders:cart"), fetch_redirect_response=False
+        )
+        mock_create.assert_not_called()
+        line = self.client.session["cart"][str(service.id)]
+        self.assertEqual(line["price"], 12.0)
+
+
+class StorageTrafficTests(TestCase):
+    """Storage reads/writes per request, counted by CountingMemoryStorage."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="storageuser", password="pass1234"
+        )
+        self.service = Service.objects.create(
+            name="Day Care", slug="day-care", description="Care", price=10,
+        )
+        default_storage.reset_counts()
+
+    def voucher(self, code):
+        order = Order.objects.create(user=self.user, is_paid=True)
+        item = OrderItem.objects.create(
+            order=order, service=self.service, quantity=1, price=10
+        )
+        return Voucher.objects.create(
+            service=self.service, order_item=item, user=self.user,
+            code=code, status="ISSUED",
+        )
+
+    def counts(self):
+        counts = dict(default_storage.counts)
+        default_storage.reset_counts()
+        return counts
+
+    @patch("stripe.Webhook.construct_event")
+    def test_webhook_writes_one_qr_per_voucher(self, mock_construct_event):
+        cart_items = [
+            {"id": str(self.service.id), "name": "Day Care",
+             "price": "10", "quantity": 2},
+        ]
+        mock_construct_event.return_value = {
+            "type": "checkout.session.completed",
+            "data": {
+                "object": SimpleNamespace(
+                    id="sess_storage",
+                    metadata={
+                        "user_id": str(self.user.id),
+                        "cart_items": str(cart_items),
+                    },
+                )
+            },
+        }
+        response = self.client.post(
+            reverse("orders:stripe_webhook"),
+            data="{}",
+            content_type="application/json",
+            HTTP_STRIPE_SIGNATURE="sig",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counts(), {"exists": 2, "save": 2})
+        self.assertGreater(default_storage.size(
+            Voucher.objects.first().qr_img_path.name
+        ), 0)
+
+    def test_voucher_qr_image_writes_once_then_only_reads(self):
+        voucher = self.voucher("storageqr01")
+        url = reverse("orders:voucher_qr", args=[voucher.code])
+        self.client.get(url)
+        self.assertEqual(self.counts(), {"exists": 2, "save": 1, "url": 1})
+        self.client.get(url)
+        self.assertEqual(self.counts(), {"exists": 1, "url": 1})
+
+    @patch("orders.views.cloud_uploader", None)
+    def test_qr_redirect_reuses_stored_image(self):
+        url = reverse("orders:qr") + "?t=hello"
+        self.client.get(url)
+        self.assertEqual(self.counts(), {"exists": 2, "save": 1, "url": 1})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.counts(), {"exists": 1, "url": 1})
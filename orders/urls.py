@@ -7,6 +7,7 @@ app_name = "orders"
 urlpatterns = [
     path('cart/', views.cart, name='cart'),
     path("cart/add/", views.add_to_cart, name="add_to_cart"),
+    path("cart/api/", views.cart_api, name="cart_api"),
     path('cart/remove/<str:item_id>/',
          views.remove_from_cart, name='remove_from_cart'),
 
@@ -20,6 +21,11 @@ urlpatterns = [
          views.redeem_voucher, name="redeem_voucher"),
     path("voucher/<str:code>/scan/",
          views.scan_voucher, name="scan_voucher"),
+    path("scan/", views.scan_lookup, name="scan_lookup"),
+    path("scan/<str:token>/", views.scan_token, name="scan_token"),
+    path("voucher-lookup/", views.voucher_lookup, name="voucher_lookup"),
+    path("scan-sync/", views.sync_offline_redemptions,
+         name="sync_offline_redemptions"),
 
     # Add a path for creating checkout sessions
     path('checkout/create-session/', views.create_checkout_session,
@@ -28,4 +34,7 @@ urlpatterns = [
     path('success/', views.success_view, name='success'),
     path('cancel/', views.cancel_view, name='cancel'),
     path('my-wallet/', views.my_wallet, name='my_wallet'),
+    path("dashboard/", views.staff_dashboard, name="staff_dashboard"),
+    path("dashboard/stream/", views.staff_dashboard_stream,
+         name="staff_dashboard_stream"),
 ]
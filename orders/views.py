@@ -2,8 +2,10 @@
 
 import ast
 import hashlib
+import json
+import time
+from datetime import timedelta
 from io import BytesIO
-import uuid
 
 import qrcode
 import stripe
@@ -15,16 +17,29 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
-from django.db import IntegrityError
-from django.http import HttpResponse, HttpResponseBadRequest
+from django.core.signing import BadSignature, SignatureExpired
+from django.db import IntegrityError, transaction
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from services.models import Service
 
+from .audit import record_redemption
+from .cart import Cart
+from .codes import generate_voucher_code, normalize_code
+from .feed import activity_feed, format_cursor, parse_cursor, tick_seconds
 from .models import Order, OrderItem, Voucher
+from .signing import make_voucher_token, read_voucher_token
 
 try:  # Cloudinary upload (optional)
     import cloudinary.uploader as cloud_uploader
@@ -43,12 +58,30 @@ except Exception:  # pragma: no cover - fallback for newer packages
 stripe.api_key = settings.STRIPE_SECRET_KEY
 User = get_user_model()
 
+VOUCHER_CODE_ATTEMPTS = 5
+LOOKUP_MIN_LENGTH = 3
+LOOKUP_LIMIT = 10
+# Hard cap on one SSE stream, below gunicorn's default 30s worker timeout.
+DASHBOARD_STREAM_MAX_SECONDS = 25
+# How far back an offline scanner may date a queued redemption.
+OFFLINE_SYNC_WINDOW = timedelta(hours=24)
+
 
 def staff_required(user):
     """Return True if user is staff or superuser."""
     return user.is_staff or user.is_superuser
 
 
+def get_voucher_or_404(request, code):
+    """Fetch a voucher by code, auditing POSTs for codes that don't exist."""
+    try:
+        return Voucher.objects.get(code=code)
+    except Voucher.DoesNotExist:
+        if request.method == "POST":
+            record_redemption(request, code, "NOT_FOUND")
+        raise Http404("No voucher matches the given code.")
+
+
 def get_site_root(request):
     """Return SITE_URL or derive from request."""
     site_root = getattr(settings, "SITE_URL", "") or ""
@@ -64,7 +97,14 @@ def create_checkout_session(request):
     if request.method != "POST":
         return redirect("orders:cart")
 
-    cart = request.session.get("cart", {})
+    cart = Cart(request.session)
+    changes = cart.refresh()
+    cart.save()
+    if changes:
+        # Let the customer confirm current prices before paying.
+        for change in changes:
+            messages.warning(request, change)
+        return redirect("orders:cart")
     if not cart:
         messages.error(request, "Your cart is empty.")
         return redirect("orders:cart")
@@ -238,23 +278,10 @@ def stripe_webhook(request):
 
                     # Generate vouchers - one per quantity
                     for i in range(total_quantity):
-                        # Generate a unique voucher code
-                        voucher_code = str(uuid.uuid4())[:16]
-
-                        # Create a voucher
-                        voucher = Voucher(
-                            service=service,
-                            order_item=order_item,
-                            user=user,
-                            code=voucher_code,
-                            status="ISSUED",
-                        )
-
-                        generate_qr_code(voucher)
-                        voucher.save()
+                        voucher = issue_voucher(service, order_item, user)
                         print(
                             "Voucher created: "
-                            f"{voucher_code} for service {service.name}"
+                            f"{voucher.code} for service {service.name}"
                         )
 
                 except Service.DoesNotExist:
@@ -276,11 +303,36 @@ def stripe_webhook(request):
     return HttpResponse(status=200)
 
 
+def issue_voucher(service, order_item, user):
+    """
+    Create an ISSUED voucher with a fresh compact code and QR image,
+    retrying with a new code if the random one is already taken.
+    """
+    for attempt in range(VOUCHER_CODE_ATTEMPTS):
+        voucher = Voucher(
+            service=service,
+            order_item=order_item,
+            user=user,
+            code=generate_voucher_code(),
+            status="ISSUED",
+        )
+        generate_qr_code(voucher)
+        try:
+            with transaction.atomic():
+                voucher.save()
+            return voucher
+        except IntegrityError:
+            if attempt == VOUCHER_CODE_ATTEMPTS - 1:
+                raise
+
+
 def generate_qr_code(voucher, site_url=None):
     """Generate and attach a QR image pointing to the staff redemption page."""
     site_root = site_url or getattr(settings, "SITE_URL", "")
     site_root = (site_root or "http://localhost:8000").rstrip("/")
-    redeem_path = reverse("orders:scan_voucher", args=[voucher.code])
+    # Encode a signed token on the short route so the scanner can reject
+    # forgeries offline and the QR symbol stays small.
+    redeem_path = reverse("short_scan", args=[make_voucher_token(voucher)])
     redeem_url = f"{site_root}{redeem_path}"
 
     qr = qrcode.QRCode(
@@ -443,9 +495,10 @@ def success_view(request):
     else:
         vouchers = Voucher.objects.filter(order_item__order=order)
 
-    if not pending and "cart" in request.session:
-        del request.session["cart"]
-        request.session.modified = True
+    if not pending:
+        cart = Cart(request.session)
+        cart.clear()
+        cart.save()
 
     return render(
         request,
@@ -507,16 +560,7 @@ def build_order_from_session(user, stripe_session, metadata, session_id):
             )
 
             for _ in range(total_quantity):
-                voucher_code = str(uuid.uuid4())[:16]
-                voucher = Voucher(
-                    service=service,
-                    order_item=order_item,
-                    user=user,
-                    code=voucher_code,
-                    status="ISSUED"
-                )
-                generate_qr_code(voucher)
-                voucher.save()
+                issue_voucher(service, order_item, user)
         except Exception:
             continue
 
@@ -598,10 +642,11 @@ def voucher_qr_image(request, code):
 @require_http_methods(["GET", "POST"])
 def redeem_voucher(request, code):
     """Staff/admin redeem flow; GET shows confirmation, POST redeems."""
-    voucher = get_object_or_404(Voucher, code=code)
+    voucher = get_voucher_or_404(request, code)
 
     if request.method == "POST":
         if voucher.status != "ISSUED":
+            record_redemption(request, code, "ALREADY_USED", voucher)
             messages.warning(
                 request,
                 "This voucher cannot be redeemed (already used or expired).",
@@ -611,6 +656,7 @@ def redeem_voucher(request, code):
         voucher.status = "REDEEMED"
         voucher.redeemed_at = timezone.now()
         voucher.save()
+        record_redemption(request, code, "REDEEMED", voucher)
         messages.success(request, f"Voucher {voucher.code} has been redeemed.")
         return redirect("orders:redeem_voucher", code=code)
 
@@ -633,16 +679,18 @@ def scan_voucher(request, code):
     """
     Staff-facing scan/verify view. Staff can redeem; others only view status.
     """
-    voucher = get_object_or_404(Voucher, code=code)
+    voucher = get_voucher_or_404(request, code)
 
     if request.method == "POST":
         if not (request.user.is_staff or request.user.is_superuser):
+            record_redemption(request, code, "DENIED", voucher)
             messages.error(
                 request, "You do not have permission to redeem vouchers."
             )
             return redirect("orders:scan_voucher", code=code)
 
         if voucher.status != "ISSUED":
+            record_redemption(request, code, "ALREADY_USED", voucher)
             messages.warning(
                 request,
                 "This voucher cannot be redeemed (already used or expired).",
@@ -652,6 +700,7 @@ def scan_voucher(request, code):
         voucher.status = "REDEEMED"
         voucher.redeemed_at = timezone.now()
         voucher.save()
+        record_redemption(request, code, "REDEEMED", voucher)
         messages.success(request, f"Voucher {voucher.code} has been redeemed.")
         return redirect("orders:scan_voucher", code=code)
 
@@ -666,6 +715,236 @@ def scan_voucher(request, code):
     return render(request, "orders/scan_voucher.html", context)
 
 
+@login_required
+def scan_token(request, token):
+    """
+    Scan a signed voucher token from a QR code. Forged or expired tokens are
+    rejected from the signature alone; valid ones continue to scan_voucher.
+    """
+    try:
+        claims = read_voucher_token(token)
+    except SignatureExpired:
+        record_redemption(request, token, "EXPIRED_TOKEN")
+        return render(
+            request,
+            "orders/vouc_not_found.html",
+            {"message": "This voucher has expired."},
+            status=410,
+        )
+    except BadSignature:
+        record_redemption(request, token, "INVALID_TOKEN")
+        return render(
+            request,
+            "orders/vouc_not_found.html",
+            {"message": "This QR code is not a valid Wag Club voucher."},
+            status=404,
+        )
+    return scan_voucher(request, claims.code)
+
+
+@login_required
+@user_passes_test(staff_required)
+@require_http_methods(["POST"])
+def sync_offline_redemptions(request):
+    """
+    Apply redemptions queued by a scanner while it was offline.
+
+    Expects JSON ``{"redemptions": [{"token": ..., "redeemed_at": ...}]}``.
+    Each token is verified without the database as of its ``redeemed_at``
+    (clamped to the last OFFLINE_SYNC_WINDOW), and audit rows are dated to
+    the scan; the surviving vouchers are redeemed with one locked read and
+    one bulk update.
+    """
+    try:
+        entries = json.loads(request.body or b"{}").get("redemptions", [])
+    except (ValueError, AttributeError):
+        return HttpResponseBadRequest("Invalid JSON payload")
+    if not isinstance(entries, list):
+        return HttpResponseBadRequest("redemptions must be a list")
+
+    now = timezone.now()
+    earliest = now - OFFLINE_SYNC_WINDOW
+    accepted = {}
+    rejected = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            entry = {}
+        token = entry.get("token")
+        try:
+            redeemed_at = parse_datetime(str(entry.get("redeemed_at") or ""))
+        except ValueError:
+            redeemed_at = None
+        if redeemed_at and timezone.is_naive(redeemed_at):
+            redeemed_at = timezone.make_aware(redeemed_at)
+        # Tokens are checked as of the scan, which must fall in the window.
+        if redeemed_at is None or redeemed_at > now:
+            redeemed_at = now
+        redeemed_at = max(redeemed_at, earliest)
+        try:
+            claims = read_voucher_token(token, now=redeemed_at)
+        except SignatureExpired:
+            rejected.append({"token": token, "reason": "expired"})
+            record_redemption(request, token, "EXPIRED_TOKEN", at=redeemed_at)
+            continue
+        except BadSignature:
+            rejected.append({"token": token, "reason": "invalid"})
+            record_redemption(
+                request, str(token or ""), "INVALID_TOKEN", at=redeemed_at
+            )
+            continue
+
+        # First scan of a code wins if the queue holds duplicates.
+        accepted.setdefault(claims.code, (token, claims, redeemed_at))
+
+    redeemed = []
+    already_used = []
+    with transaction.atomic():
+        vouchers = Voucher.objects.select_for_update().filter(
+            code__in=list(accepted)
+        )
+        to_update = []
+        for voucher in vouchers:
+            token, claims, redeemed_at = accepted.pop(voucher.code)
+            if voucher.service_id != claims.service_id:
+                rejected.append({"token": token, "reason": "invalid"})
+                record_redemption(
+                    request, token, "INVALID_TOKEN", voucher, at=redeemed_at
+                )
+            elif voucher.status != "ISSUED":
+                already_used.append(voucher.code)
+                record_redemption(
+                    request, voucher.code, "ALREADY_USED", voucher,
+                    at=redeemed_at,
+                )
+            else:
+                voucher.status = "REDEEMED"
+                voucher.redeemed_at = redeemed_at
+                to_update.append(voucher)
+                redeemed.append(voucher.code)
+                record_redemption(
+                    request, voucher.code, "REDEEMED", voucher, at=redeemed_at
+                )
+        Voucher.objects.bulk_update(to_update, ["status", "redeemed_at"])
+
+    for token, claims, redeemed_at in accepted.values():
+        rejected.append({"token": token, "reason": "not_found"})
+        record_redemption(request, claims.code, "NOT_FOUND", at=redeemed_at)
+
+    return JsonResponse(
+        {
+            "redeemed": redeemed,
+            "already_used": already_used,
+            "rejected": rejected,
+        }
+    )
+
+
+@login_required
+@user_passes_test(staff_required)
+def scan_lookup(request):
+    """Staff page for finding a voucher by typing part of its code."""
+    return render(
+        request, "orders/scan_lookup.html", {"page_title": "Find Voucher"}
+    )
+
+
+@login_required
+@user_passes_test(staff_required)
+def voucher_lookup(request):
+    """
+    Return up to LOOKUP_LIMIT vouchers whose code starts with ?q=, ignoring
+    case. Backed by the orders_voucher_code_iprefix index.
+    """
+    query = (request.GET.get("q") or "").strip()
+    if "-" not in query:
+        # Fold I/L/O typos; legacy hex codes never contain those letters.
+        query = normalize_code(query)
+    if len(query) < LOOKUP_MIN_LENGTH:
+        return JsonResponse({"results": []})
+
+    matches = (
+        Voucher.objects.filter(code__istartswith=query)
+        .order_by()  # skip the default sort so the index scan can stop early
+        .values("code", "status", "service__name")[:LOOKUP_LIMIT]
+    )
+    results = [
+        {
+            "code": row["code"],
+            "status": row["status"],
+            "service": row["service__name"],
+            "url": reverse("orders:scan_voucher", args=[row["code"]]),
+        }
+        for row in matches
+    ]
+    return JsonResponse({"results": results})
+
+
+@login_required
+@user_passes_test(staff_required)
+def staff_dashboard(request):
+    """Live view of today's redemptions and sales for staff."""
+    today = timezone.localdate()
+    context = {
+        "redeemed_today": Voucher.objects.filter(
+            status="REDEEMED", redeemed_at__date=today
+        ).count(),
+        "sales_today": Order.objects.filter(
+            is_paid=True, created_at__date=today
+        ).count(),
+        "page_title": "Live Dashboard",
+    }
+    return render(request, "orders/dashboard.html", context)
+
+
+def dashboard_events(cursor, duration):
+    """Yield server-sent events from the shared activity feed."""
+    # Tell EventSource how soon to reconnect once this stream ends.
+    yield "retry: 2000\n\n"
+    deadline = time.monotonic() + duration
+    while True:
+        events, head = activity_feed.since(cursor)
+        if cursor is None:
+            cursor = head
+            yield f"id: {format_cursor(cursor)}\n\n"
+        for event in events:
+            cursor = event.cursor
+            yield (
+                f"id: {format_cursor(cursor)}\n"
+                f"event: {event.kind}\n"
+                f"data: {json.dumps(event.data)}\n\n"
+            )
+        if not events:
+            yield ": ping\n\n"
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(min(tick_seconds(), remaining))
+
+
+@login_required
+@user_passes_test(staff_required)
+def staff_dashboard_stream(request):
+    """
+    Stream redemption and sale events over SSE. Each stream is capped at
+    DASHBOARD_STREAM_SECONDS (never more than DASHBOARD_STREAM_MAX_SECONDS)
+    so it ends before gunicorn's worker timeout; the browser reconnects
+    with Last-Event-ID and resumes from its cursor.
+    """
+    cursor = parse_cursor(
+        request.headers.get("Last-Event-ID") or request.GET.get("cursor")
+    )
+    duration = min(
+        getattr(settings, "DASHBOARD_STREAM_SECONDS", 20),
+        DASHBOARD_STREAM_MAX_SECONDS,
+    )
+    response = StreamingHttpResponse(
+        dashboard_events(cursor, duration), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @login_required
 def my_wallet(request):
     """Display all of a user's vouchers grouped by status."""
@@ -694,64 +973,97 @@ def my_wallet(request):
     return render(request, "orders/my_wallet.html", context)
 
 
+def parse_quantity(raw, minimum=1):
+    """Return raw as an int >= minimum, or None if it is not valid."""
+    try:
+        quantity = int(raw)
+    except (TypeError, ValueError):
+        return None
+    return quantity if quantity >= minimum else None
+
+
 @login_required
 def add_to_cart(request):
     """Add a service to the session cart."""
     if request.method != "POST":
         return redirect("orders:cart")
 
-    service_id = request.POST.get("service_id")
-    raw_qty = request.POST.get("quantity", 1)
-    try:
-        qty = int(raw_qty)
-    except (TypeError, ValueError):
-        messages.error(request, "Invalid quantity.")
-        return redirect("orders:cart")
-
-    if qty <= 0:
+    qty = parse_quantity(request.POST.get("quantity", 1))
+    if qty is None:
         messages.error(request, "Quantity must be at least 1.")
         return redirect("orders:cart")
 
-    service = get_object_or_404(Service, id=service_id, is_active=True)
+    service = get_object_or_404(
+        Service, id=request.POST.get("service_id"), is_active=True
+    )
 
-    cart = request.session.get("cart", {})
-    key = str(service.id)
+    cart = Cart(request.session)
+    cart.add(service, qty)
+    cart.save()
 
-    if key in cart:
-        cart[key]["quantity"] += max(qty, 1)
-    else:
-        cart[key] = {
-            "name": service.name,
-            # stored once; never trust client values
-            "price": float(service.price),
-            "quantity": max(qty, 1),
-        }
+    messages.success(request, f"Added {service.name} to your cart.")
+    return redirect("orders:cart")
 
-    request.session["cart"] = cart
-    request.session.modified = True
 
-    messages.success(request, f"Added {service.name} to your cart.")
+@require_http_methods(["POST"])
+def cart_api(request):
+    """
+    JSON cart endpoint used by the catalogue's add-to-cart buttons.
 
-    # Check all messages in the request
-    storage = messages.get_messages(request)
-    print(f"All messages: {[msg.message for msg in storage]}")
-    storage.used = False  # reset iterator so Django can use it again
+    POST ``action`` (add, update or remove), ``service_id`` and, for add or
+    update, ``quantity``. Responds with the new cart count and total.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse(
+            {
+                "error": "Log in to add services to your cart.",
+                "login_url": settings.LOGIN_URL,
+            },
+            status=401,
+        )
 
-    request.session.save()
+    action = request.POST.get("action", "add")
+    service_id = request.POST.get("service_id")
+    cart = Cart(request.session)
+
+    if action == "add":
+        qty = parse_quantity(request.POST.get("quantity", 1))
+        if qty is None:
+            return JsonResponse({"error": "Invalid quantity."}, status=400)
+        service = Service.objects.filter(id=service_id, is_active=True).first()
+        if service is None:
+            return JsonResponse({"error": "Service not found."}, status=404)
+        cart.add(service, qty)
+        message = f"Added {service.name} to your cart."
+    elif action in ("update", "remove"):
+        qty = 0
+        if action == "update":
+            qty = parse_quantity(request.POST.get("quantity"), minimum=0)
+            if qty is None:
+                return JsonResponse({"error": "Invalid quantity."}, status=400)
+        if not cart.set_quantity(service_id, qty):
+            return JsonResponse({"error": "Item not in cart."}, status=404)
+        message = "Cart updated."
+    else:
+        return JsonResponse({"error": "Unknown action."}, status=400)
 
-    return redirect("orders:cart")
+    cart.save()
+    summary = cart.summary
+    return JsonResponse(
+        {
+            "message": message,
+            "count": summary["count"],
+            "total": summary["total"],
+        }
+    )
 
 
 def remove_from_cart(request, item_id):
     """Remove an item from the session cart."""
-    cart = request.session.get("cart", {})
-
-    print(f"Current cart contents: {cart}")
+    cart = Cart(request.session)
 
-    if item_id in cart:
-        del cart[item_id]
-        request.session["cart"] = cart
-        request.session.modified = True
+    if cart.remove(item_id):
+        cart.save()
         messages.info(request, "Item removed from cart successfully.")
     else:
         # Add specific message if item wasn't found
@@ -761,9 +1073,11 @@ def remove_from_cart(request, item_id):
 
 
 def cart(request):
-    """Display the current session cart."""
-    cart = request.session.get(
-        "cart", {})
+    """Display the current session cart, re-priced from the catalogue."""
+    cart = Cart(request.session)
+    for change in cart.refresh():
+        messages.warning(request, change)
+    cart.save()
     cart_items = []
     total_amount = 0.0
 
@@ -90,6 +90,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
     'django_filters',
 
     'cloudinary_storage',
@@ -132,10 +133,28 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'orders.middleware.RedemptionAuditMiddleware',
 ]
 
-# Use session-based message storage
-MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
+# Session/message storage mode (SESSION_MODE env):
+# - "db" (default): database sessions, session-based messages
+# - "cache": cached_db sessions (cache reads, DB fallback), cookie-first
+#   messages so flash messages don't rewrite the session
+# - "cookie": signed, compressed cookie sessions and cookie messages, so
+#   carts and messages never touch django_session
+SESSION_MODE = os.getenv("SESSION_MODE", "db").strip().lower()
+if SESSION_MODE == "cookie":
+    SESSION_ENGINE = "django.contrib.sessions.backends.signed_cookies"
+    MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+elif SESSION_MODE == "cache":
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+    MESSAGE_STORAGE = (
+        "django.contrib.messages.storage.fallback.FallbackStorage"
+    )
+else:
+    MESSAGE_STORAGE = (
+        "django.contrib.messages.storage.session.SessionStorage"
+    )
 
 ROOT_URLCONF = 'project_core.urls'
 
@@ -188,6 +207,25 @@ else:
     # Keep connections alive on idle dynos
     DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
 
+# Cached data is invalidated by bumping version keys, which only reaches
+# every gunicorn worker and management command through a shared cache.
+# Without REDIS_URL each process gets its own LocMem cache and cached
+# entries fall back to short lifetimes (core.caching).
+REDIS_URL = os.getenv("REDIS_URL", "")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 AUTHENTICATION_BACKENDS = [
 
     'axes.backends.AxesBackend',
@@ -319,9 +357,26 @@ STORAGES = {
     },
 }
 
+# MEDIA_STORAGE=memory keeps media in process memory (core.storage)
+MEDIA_STORAGE = os.getenv("MEDIA_STORAGE", "")
+if MEDIA_STORAGE == "memory":
+    STORAGES["default"]["BACKEND"] = "core.storage.CountingMemoryStorage"
+
+# Processes that render responsive image variants (0 renders inline)
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", 2))
+
 # Base site URL for QR codes and absolute links
 SITE_URL = os.getenv("SITE_URL", "http://localhost:8000")
 
+# HMAC key for signed voucher QR tokens (falls back to SECRET_KEY)
+VOUCHER_TOKEN_KEY = os.getenv("VOUCHER_TOKEN_KEY", "")
+
+# Staff live dashboard (SSE): shared feed poll interval and stream length.
+# Streams must end well inside gunicorn's 30s worker timeout; EventSource
+# reconnects and resumes from its cursor.
+DASHBOARD_TICK_SECONDS = float(os.getenv("DASHBOARD_TICK_SECONDS", 2))
+DASHBOARD_STREAM_SECONDS = int(os.getenv("DASHBOARD_STREAM_SECONDS", 20))
+
 # django-axes: brute-force protection
 AXES_ENABLED = True
 AXES_FAILURE_LIMIT = int(os.getenv("AXES_FAILURE_LIMIT", 5))
@@ -336,7 +391,22 @@ if "test" in sys.argv:
     AXES_ENABLED = False  # Disable Axes during tests
     # Ensure tests do not depend on network/cloud media availability.
     USE_CLOUDINARY_MEDIA = False
-    STORAGES["default"]["BACKEND"] = "django.core.files.storage.FileSystemStorage"
+    # In-memory media keeps test runs off the disk and lets tests count
+    # storage operations.
+    STORAGES["default"]["BACKEND"] = "core.storage.CountingMemoryStorage"
+    IMAGE_VARIANT_WORKERS = 0
+
+# Optional read-through disk cache in front of media storage (core.storage)
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", "")
+if MEDIA_CACHE_DIR and "test" not in sys.argv:
+    STORAGES["default"] = {
+        "BACKEND": "core.storage.CachedStorage",
+        "OPTIONS": {
+            "backend": STORAGES["default"]["BACKEND"],
+            "location": MEDIA_CACHE_DIR,
+            "max_bytes": int(os.getenv("MEDIA_CACHE_MAX_MB", 256)) * 1024 * 1024,
+        },
+    }
 
 # Logging to stdout so production errors emit tracebacks to Heroku logs
 LOGGING = {
@@ -21,6 +21,7 @@ from services import views as service_views
 from django.conf import settings
 from django.conf.urls.static import static
 from core import views as core_views
+from orders import views as order_views
 
 app_name = "orders"
 
@@ -35,6 +36,8 @@ urlpatterns = [
     path("", service_views.home, name="home"),
     path("services/", include("services.urls", namespace="services")),
     path("orders/", include("orders.urls", namespace="orders")),
+    # Short voucher scan route keeps QR payloads (and symbols) small
+    path("v/<str:token>/", order_views.scan_token, name="short_scan"),
     path(
         "robots.txt",
         TemplateView.as_view(
@@ -0,0 +1,110 @@
+"""Content-addressed storage for service media.
+
+The same photo is often uploaded for several services and gallery rows.
+Uploads are hashed in one streamed pass and stored once; MediaBlob maps
+the SHA-256 digest to the stored name, so every field holding the same
+bytes points at a single file:
+
+    services/blobs/3f/3fa2...c9.jpg
+
+The mapping lives in the database rather than being derived from the
+name because Cloudinary returns its own public ids. Each blob records
+the storage backend holding it, and lookups only reuse blobs from the
+storage being written to. Blobs are never deleted with a row, since
+other rows may still reference them.
+"""
+
+import hashlib
+from pathlib import PurePosixPath
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+
+from core.media import storage_backend
+
+from .models import MediaBlob
+
+BLOB_DIR = "blobs"
+CHUNK_SIZE = 64 * 1024
+
+
+def content_digest(content, chunk_size=CHUNK_SIZE):
+    """Return (SHA-256 hex digest, size) of a Django File, read in chunks."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in content.chunks(chunk_size):
+        digest.update(chunk)
+        size += len(chunk)
+    content.seek(0)
+    return digest.hexdigest(), size
+
+
+def blob_name(digest, original_name, upload_to="services"):
+    """Storage name for a digest, keeping the original file extension."""
+    extension = PurePosixPath(original_name or "").suffix.lower()
+    return f"{upload_to}/{BLOB_DIR}/{digest[:2]}/{digest}{extension}"
+
+
+def storage_key(storage=None):
+    """Dotted path of the backend that ``storage`` writes to."""
+    if storage is None or storage is default_storage:
+        return storage_backend()
+    cls = type(storage)
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def known_blobs(storage=None):
+    """Return {digest: name} for blobs already held by ``storage``."""
+    return dict(
+        MediaBlob.objects.filter(storage=storage_key(storage))
+        .values_list("digest", "name")
+    )
+
+
+def store_blob(content, original_name, upload_to="services", storage=None):
+    """
+    Save content once per digest and return the stored name.
+
+    Identical bytes always map to the same name; only the first upload
+    of a digest reaches storage.
+    """
+    storage = storage or default_storage
+    key = storage_key(storage)
+    digest, size = content_digest(content)
+    blobs = MediaBlob.objects.filter(storage=key)
+    existing = blobs.filter(digest=digest).first()
+    if existing:
+        return existing.name
+    stored = storage.save(blob_name(digest, original_name, upload_to), content)
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(
+                digest=digest, storage=key, name=stored, size=size
+            )
+    except IntegrityError:
+        # A concurrent upload of the same bytes won; drop our copy.
+        storage.delete(stored)
+        return blobs.get(digest=digest).name
+    return stored
+
+
+def upload_dir(field):
+    upload_to = field.upload_to if isinstance(field.upload_to, str) else ""
+    return upload_to.strip("/") or "media"
+
+
+def dedupe_upload(instance, field_name):
+    """
+    Store a pending upload on instance.<field_name> as a blob.
+
+    Runs before the model saves, so FileField.pre_save sees a committed
+    file and does not write a second copy.
+    """
+    field_file = getattr(instance, field_name)
+    if not field_file or field_file._committed:
+        return
+    field = instance._meta.get_field(field_name)
+    field_file.name = store_blob(
+        field_file.file, field_file.name, upload_dir(field), field_file.storage
+    )
+    field_file._committed = True
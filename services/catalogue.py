@@ -0,0 +1,92 @@
+"""Cached, single-query service catalogue for the listing page."""
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+from core.caching import cache_timeout
+
+from .models import SERVICE_CATEGORY, Service, ServiceImage
+
+CATALOGUE_VERSION_KEY = "services:catalogue-version"
+CATALOGUE_TIMEOUT = 60 * 60 * 24
+# Bumps do not reach other processes' LocMem caches; bound staleness.
+LOCAL_CATALOGUE_TIMEOUT = 30
+
+
+def main_image_prefetch():
+    """
+    Prefetch each service's main gallery image into ``main_images``. The
+    is_main filter matches the unique_main_image_per_service partial index.
+    """
+    return Prefetch(
+        "images",
+        queryset=ServiceImage.objects.filter(is_main=True),
+        to_attr="main_images",
+    )
+
+
+def gallery_prefetch():
+    """Prefetch the ordered gallery into ``gallery``."""
+    return Prefetch(
+        "images",
+        queryset=ServiceImage.objects.order_by("sort_order", "id"),
+        to_attr="gallery",
+    )
+
+
+def catalogue_version():
+    """Return the current catalogue version, creating one if missing."""
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted key never reuses an old version.
+        cache.add(CATALOGUE_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOGUE_VERSION_KEY)
+    return version
+
+
+def _bump():
+    try:
+        cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOGUE_VERSION_KEY, time.time_ns(), None)
+
+
+def bump_catalogue_version():
+    """
+    Invalidate every cached catalogue entry by moving to a new version,
+    now and again once the current transaction commits: a request racing
+    the write could otherwise cache pre-commit rows under the new version.
+    """
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def catalogue_sections():
+    """
+    Return {category name: [active services ordered by price]} for every
+    SERVICE_CATEGORY, loaded with one query (plus one for main images)
+    and cached per version. The services carry their rating rollups, so
+    cards need no per-service aggregate; review changes bump the version
+    too.
+    """
+    key = f"services:catalogue:{catalogue_version()}"
+    sections = cache.get(key)
+    if sections is None:
+        sections = {name: [] for name, _label in SERVICE_CATEGORY}
+        services = (
+            Service.objects.filter(is_active=True)
+            .select_related("category")
+            .prefetch_related(main_image_prefetch())
+            .order_by("price", "id")
+        )
+        for service in services:
+            if service.category and service.category.name in sections:
+                sections[service.category.name].append(service)
+        cache.set(
+            key, sections,
+            cache_timeout(CATALOGUE_TIMEOUT, LOCAL_CATALOGUE_TIMEOUT),
+        )
+    return sections
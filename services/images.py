@@ -0,0 +1,207 @@
+"""Responsive renditions of service images.
+
+When a Service.img_path or ServiceImage.image_url upload is saved, the
+original is resized to a few widths and encoded as AVIF, WebP and JPEG.
+The resizing is CPU bound, so it runs in a process pool; a dispatcher
+thread waits for the pool, writes the files to default storage and
+records them in the model's ``image_variants`` JSON:
+
+    {"src": "services/dog.jpg", "width": 1600, "height": 1200,
+     "variants": {"webp": [[320, "services/variants/dog-320.webp"], ...]}}
+
+Rows sharing a stored blob (services.blobs) share its renditions: a
+record already built for the same ``src`` is copied instead of rendered.
+
+IMAGE_VARIANT_WORKERS=0 renders inline in the request instead (tests).
+"""
+
+import io
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+from .catalogue import bump_catalogue_version
+from .models import Service, ServiceImage
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (320, 640, 1280)
+# Preferred first; <picture> lists sources in this order.
+VARIANT_FORMATS = ("avif", "webp", "jpeg")
+PIL_FORMATS = {"avif": "AVIF", "webp": "WEBP", "jpeg": "JPEG"}
+QUALITY = {"avif": 55, "webp": 75, "jpeg": 80}
+VARIANT_SOURCES = ((Service, "img_path"), (ServiceImage, "image_url"))
+
+
+def available_formats():
+    return [
+        fmt for fmt in VARIANT_FORMATS
+        if fmt == "jpeg" or features.check(fmt)
+    ]
+
+
+def target_widths(width):
+    """Widths to render for an original of the given width (no upscaling)."""
+    widths = [w for w in VARIANT_WIDTHS if w < width]
+    return widths or [width]
+
+
+def render_variants(data, formats=None):
+    """
+    Resize image bytes to every target width and format.
+
+    Returns (width, height, [(format, width, bytes)]). Pure function so it
+    can run in a worker process.
+    """
+    formats = formats or available_formats()
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        width, height = image.size
+        renditions = []
+        for target in target_widths(width):
+            resized = image.resize(
+                (target, max(1, round(height * target / width))),
+                Image.Resampling.LANCZOS,
+            )
+            for fmt in formats:
+                frame = resized
+                if fmt == "jpeg" and frame.mode != "RGB":
+                    frame = frame.convert("RGB")
+                out = io.BytesIO()
+                frame.save(out, PIL_FORMATS[fmt], quality=QUALITY[fmt])
+                renditions.append((fmt, target, out.getvalue()))
+    return width, height, renditions
+
+
+def variant_name(source_name, width, fmt):
+    path = PurePosixPath(source_name)
+    extension = "jpg" if fmt == "jpeg" else fmt
+    return str(path.parent / "variants" / f"{path.stem}-{width}.{extension}")
+
+
+def store_variants(source_name, rendered):
+    """Save rendered variants to default storage; return the JSON record."""
+    width, height, renditions = rendered
+    variants = {}
+    for fmt, target, data in renditions:
+        name = default_storage.save(
+            variant_name(source_name, target, fmt), ContentFile(data)
+        )
+        variants.setdefault(fmt, []).append([target, name])
+    return {
+        "src": source_name,
+        "width": width,
+        "height": height,
+        "variants": variants,
+    }
+
+
+def shared_variants(source_name):
+    """Return the variants record of any row already showing source_name."""
+    for model, field_name in VARIANT_SOURCES:
+        record = (
+            model.objects.filter(
+                **{field_name: source_name, "image_variants__src": source_name}
+            )
+            .values_list("image_variants", flat=True)
+            .first()
+        )
+        if record:
+            return record
+    return None
+
+
+def read_source(field_file):
+    with field_file.open("rb") as handle:
+        return handle.read()
+
+
+def apply_variants(model, pk, field_name, source_name, record):
+    """Save a record unless the image was replaced in the meantime."""
+    model.objects.filter(pk=pk, **{field_name: source_name}).update(
+        image_variants=record
+    )
+    # Cached catalogue cards carry image_variants; UPDATE sends no signal.
+    bump_catalogue_version()
+
+
+_pool_lock = threading.Lock()
+_pools = {}
+
+
+def _executors():
+    with _pool_lock:
+        if not _pools:
+            workers = settings.IMAGE_VARIANT_WORKERS
+            _pools["render"] = ProcessPoolExecutor(max_workers=workers)
+            _pools["dispatch"] = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="image-variants"
+            )
+        return _pools["render"], _pools["dispatch"]
+
+
+def _generate(model, pk, field_name, source_name, data, render):
+    try:
+        # Another row may have rendered the same blob since scheduling.
+        record = shared_variants(source_name) or store_variants(
+            source_name, render(data)
+        )
+        apply_variants(model, pk, field_name, source_name, record)
+    except Exception:
+        logger.exception(
+            "Could not build image variants for %s %s (%s)",
+            model.__name__, pk, source_name,
+        )
+
+
+def schedule_variants(instance, field_name):
+    """Build variants for instance's image once the transaction commits."""
+    field_file = getattr(instance, field_name)
+    source_name = field_file.name
+    model, pk = type(instance), instance.pk
+
+    def start():
+        record = shared_variants(source_name)
+        if record:
+            apply_variants(model, pk, field_name, source_name, record)
+            return
+        try:
+            data = read_source(field_file)
+        except Exception:
+            logger.exception("Could not read image %s", source_name)
+            return
+        if not settings.IMAGE_VARIANT_WORKERS:
+            _generate(model, pk, field_name, source_name, data,
+                      render_variants)
+            return
+        render_pool, dispatcher = _executors()
+
+        def run():
+            try:
+                _generate(
+                    model, pk, field_name, source_name, data,
+                    lambda raw: render_pool.submit(
+                        render_variants, raw
+                    ).result(),
+                )
+            finally:
+                close_old_connections()
+
+        dispatcher.submit(run)
+
+    transaction.on_commit(start)
+
+
+def needs_variants(instance, field_name):
+    """True when the image changed since its variants were generated."""
+    name = getattr(instance, field_name).name or ""
+    return (instance.image_variants or {}).get("src", "") != name
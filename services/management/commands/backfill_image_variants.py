@@ -0,0 +1,134 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from itertools import batched
+
+from django.core.management.base import BaseCommand
+
+from core.media import uses_cloudinary
+from services.images import (
+    apply_variants,
+    needs_variants,
+    read_source,
+    render_variants,
+    shared_variants,
+    store_variants,
+)
+from services.models import Service, ServiceImage
+
+logger = logging.getLogger(__name__)
+
+TARGETS = [(Service, "img_path"), (ServiceImage, "image_url")]
+BATCH_SIZE = 16
+
+
+def iter_missing(force=False):
+    for model, field_name in TARGETS:
+        queryset = model.objects.exclude(**{field_name: ""}).exclude(
+            **{f"{field_name}__isnull": True}
+        )
+        for obj in queryset.only("id", field_name, "image_variants"):
+            if force or needs_variants(obj, field_name):
+                yield obj, field_name
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate responsive AVIF/WebP/JPEG variants for existing service "
+        "images, rendering in a process pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Render processes (default: CPU count; 0 renders inline).",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate variants even when they are up to date.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List images that need variants without generating them.",
+        )
+
+    def handle(self, *args, **opts):
+        if uses_cloudinary():
+            self.stdout.write(
+                "Media is on Cloudinary, which resizes on delivery; "
+                "nothing to backfill."
+            )
+            return
+        if opts["dry_run"]:
+            for obj, field_name in iter_missing(opts["force"]):
+                name = getattr(obj, field_name).name
+                self.stdout.write(f"[DRY RUN] Would render {name}")
+            return
+
+        workers = opts["workers"]
+        pool = None if workers == 0 else ProcessPoolExecutor(workers)
+        generated = reused = skipped = 0
+        records = {}  # source name -> variants record found or built
+        try:
+            # Read a batch at a time so originals are not all held in memory.
+            for batch in batched(iter_missing(opts["force"]), BATCH_SIZE):
+                jobs = {}  # source name -> (data, future, [(obj, field)])
+                for obj, field_name in batch:
+                    field_file = getattr(obj, field_name)
+                    name = field_file.name
+                    if name in jobs:
+                        jobs[name][2].append((obj, field_name))
+                        continue
+                    if name not in records and not opts["force"]:
+                        # Rows sharing a blob share its renditions.
+                        records[name] = shared_variants(name)
+                    if records.get(name):
+                        apply_variants(
+                            type(obj), obj.pk, field_name, name, records[name]
+                        )
+                        reused += 1
+                        continue
+                    try:
+                        data = read_source(field_file)
+                    except Exception:
+                        logger.warning("Could not read image %s", name)
+                        skipped += 1
+                        continue
+                    future = (
+                        None if pool is None
+                        else pool.submit(render_variants, data)
+                    )
+                    jobs[name] = (data, future, [(obj, field_name)])
+
+                for name, (data, future, rows) in jobs.items():
+                    # One bad upload must not stop the rest of the backfill.
+                    try:
+                        result = (
+                            render_variants(data) if future is None
+                            else future.result()
+                        )
+                        records[name] = store_variants(name, result)
+                    except Exception:
+                        logger.exception(
+                            "Could not build image variants for %s", name
+                        )
+                        skipped += len(rows)
+                        continue
+                    for obj, field_name in rows:
+                        apply_variants(
+                            type(obj), obj.pk, field_name, name, records[name]
+                        )
+                        generated += 1
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated: {generated}, Reused: {reused}, "
+                f"Skipped: {skipped}"
+            )
+        )
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from services.catalogue import bump_catalogue_version
+from services.models import Service, ServiceCategory
+from services.search import fuzzy_search_services, trigram_index
+from services.views import icontains_search
+
+ADJECTIVES = [
+    "Deluxe", "Express", "Gentle", "Premium", "Puppy", "Senior", "Weekend",
+    "Sunny", "Cosy", "Active", "Calm", "Happy",
+]
+NOUNS = [
+    "Grooming", "Daycare", "Bath", "Walk", "Trim", "Playtime", "Pawdicure",
+    "Sleepover", "Training", "Spa", "Boarding", "Cuddles",
+]
+QUERIES = ["groming", "daycar", "pupy bath", "premum spa", "sleepovr", "trainin"]
+
+
+class _Rollback(Exception):
+    pass
+
+
+def timed(fn, repeat):
+    """Return (median milliseconds, last result) over repeat calls."""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark typo-tolerant trigram search against the icontains "
+        "fallback on a synthetic catalogue. Runs inside a transaction that "
+        "is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--services",
+            type=int,
+            default=5000,
+            help="How many synthetic services to create.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=50,
+            help="How many times to run each query.",
+        )
+
+    def populate(self, count):
+        rng = random.Random(42)
+        category, _ = ServiceCategory.objects.get_or_create(
+            slug="bench-packages", defaults={"name": "Packages"}
+        )
+        Service.objects.bulk_create(
+            Service(
+                category=category,
+                name=f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+                slug=f"bench-service-{i}",
+                description="Synthetic benchmark service.",
+                price=rng.randint(5, 99),
+            )
+            for i in range(count)
+        )
+        # bulk_create skips signals, so move the catalogue on by hand.
+        bump_catalogue_version()
+
+    def handle(self, *args, **opts):
+        count = max(opts["services"], 1)
+        repeat = max(opts["repeat"], 1)
+        rows = []
+        try:
+            with transaction.atomic():
+                self.populate(count)
+                start = time.perf_counter()
+                index = trigram_index()
+                build_ms = (time.perf_counter() - start) * 1000
+                for query in QUERIES:
+                    index_ms, hits = timed(
+                        lambda: index.search(query, 50), repeat
+                    )
+                    fuzzy_ms, _ = timed(
+                        lambda: list(fuzzy_search_services(query)), repeat
+                    )
+                    plain_ms, plain = timed(
+                        lambda: list(icontains_search(query)), repeat
+                    )
+                    rows.append(
+                        (query, len(hits), index_ms, fuzzy_ms, len(plain),
+                         plain_ms)
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(
+            f"{count} services on {connection.vendor}; trigram index built "
+            f"in {build_ms:.1f} ms ({len(index)} distinct words)."
+        )
+        self.stdout.write(
+            f"{'query':<12}{'hits':>6}{'index ms':>10}{'fuzzy ms':>10}"
+            f"{'icontains':>11}{'ms':>8}"
+        )
+        for query, hits, index_ms, fuzzy_ms, plain, plain_ms in rows:
+            self.stdout.write(
+                f"{query:<12}{hits:>6}{index_ms:>10.2f}{fuzzy_ms:>10.2f}"
+                f"{plain:>11}{plain_ms:>8.2f}"
+            )
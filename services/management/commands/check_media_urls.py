@@ -1,15 +1,27 @@
 from __future__ import annotations
 
+import csv
+import json
 import logging
-import requests
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
 from typing import Iterable, Tuple
+from urllib.parse import urlsplit
 
+import requests
 from django.core.management.base import BaseCommand
+from requests.adapters import HTTPAdapter
 
 from services.models import Service, ServiceImage
 
 logger = logging.getLogger(__name__)
 
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_BACKOFF = 30.0
+
 
 def iter_targets() -> Iterable[Tuple[object, str]]:
     for s in Service.objects.exclude(img_path="").exclude(img_path__isnull=True):
@@ -18,6 +30,112 @@ def iter_targets() -> Iterable[Tuple[object, str]]:
         yield si, "image_url"
 
 
+def original_url(field_file) -> str:
+    """
+    URL of the stored file itself. Delivery helpers such as media_url add
+    Cloudinary transformations, and checking those would render (and bill
+    for) a derived image instead of checking the original.
+    """
+    name = field_file.name
+    if name.startswith(("http://", "https://")):
+        return name
+    return field_file.url
+
+
+@dataclass
+class CheckResult:
+    model: str
+    pk: int
+    field: str
+    name: str
+    url: str
+    status: int | None
+    ok: bool
+    attempts: int
+    error: str
+    elapsed_ms: float
+
+
+class HostRateLimiter:
+    """Space out requests to each host to at most `rate` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def make_session(concurrency):
+    """One keep-alive session whose connection pool fits every worker."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=concurrency, pool_maxsize=concurrency
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def backoff_delay(attempt, base, response=None):
+    """Full-jitter exponential backoff, honouring a numeric Retry-After."""
+    # A 4xx/5xx Response is falsy, so test for None explicitly.
+    retry_after = (
+        response.headers.get("Retry-After") if response is not None else None
+    )
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), MAX_BACKOFF)
+    return random.uniform(0, min(base * 2 ** attempt, MAX_BACKOFF))
+
+
+def check_url(session, url, limiter, retries, timeout, backoff):
+    """Return (status, attempts, error) for a URL, retrying transient failures."""
+    host = urlsplit(url).netloc
+    status, error = None, ""
+    for attempt in range(retries + 1):
+        limiter.wait(host)
+        response = None
+        try:
+            response = session.head(url, timeout=timeout, allow_redirects=True)
+            if response.status_code == 405:
+                # Some origins refuse HEAD; fetch headers only via GET.
+                response.close()
+                limiter.wait(host)
+                response = session.get(url, timeout=timeout, stream=True)
+            status, error = response.status_code, ""
+            response.close()
+            if status not in RETRY_STATUSES:
+                return status, attempt + 1, error
+        except requests.RequestException as exc:
+            status, error = None, str(exc)
+        if attempt < retries:
+            time.sleep(backoff_delay(attempt, backoff, response))
+    return status, retries + 1, error
+
+
+def write_report(path, results):
+    rows = [asdict(result) for result in results]
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as handle:
+            writer = csv.DictWriter(
+                handle, fieldnames=list(CheckResult.__dataclass_fields__)
+            )
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(path, "w") as handle:
+            json.dump(rows, handle, indent=2)
+
+
 class Command(BaseCommand):
     help = "Check Service and ServiceImage URLs for reachability (200)."
 
@@ -28,48 +146,115 @@ class Command(BaseCommand):
             default=None,
             help="Limit number of checks (for quick runs).",
         )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=16,
+            help="How many URLs to check at once.",
+        )
+        parser.add_argument(
+            "--per-host-rate",
+            type=float,
+            default=20.0,
+            help="Max requests per second to any one host (0 = unlimited).",
+        )
+        parser.add_argument(
+            "--retries",
+            type=int,
+            default=3,
+            help="Retries for timeouts, connection errors, 429 and 5xx.",
+        )
+        parser.add_argument(
+            "--backoff",
+            type=float,
+            default=0.5,
+            help="Base seconds for jittered exponential backoff.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=5.0,
+            help="Per-request timeout in seconds.",
+        )
+        parser.add_argument(
+            "--report",
+            default=None,
+            help="Write every result to this .json or .csv file.",
+        )
 
     def handle(self, *args, **opts):
         limit = opts.get("limit")
-        checked = 0
-        ok = 0
+        concurrency = max(opts["concurrency"], 1)
+        results = []
         missing = 0
-        errors = 0
+        jobs = []
 
         for obj, field_name in iter_targets():
-            if limit is not None and checked >= limit:
+            if limit is not None and len(jobs) + missing >= limit:
                 break
-
             f = getattr(obj, field_name, None)
+            name = getattr(f, "name", "") if f else ""
             try:
-                url = f.url  # may raise if missing
+                url = original_url(f) if name else ""
             except Exception:
-                url = None
-
-            checked += 1
-            name = getattr(f, "name", "") if f else ""
-
+                url = ""  # storage could not build a URL for this name
             if not url:
                 self.stdout.write(self.style.WARNING(f"[no url] {obj} {name}"))
                 missing += 1
                 continue
+            jobs.append((obj, field_name, name, url))
 
-            try:
-                resp = requests.head(url, timeout=5)
-                status = resp.status_code
-                if status == 200:
-                    ok += 1
-                else:
-                    self.stdout.write(
-                        self.style.ERROR(f"[bad status {status}] {obj} {name} {url}")
-                    )
-                    errors += 1
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"[error] {obj} {name} {url} :: {e}"))
-                errors += 1
+        limiter = HostRateLimiter(opts["per_host_rate"])
+        session = make_session(concurrency)
+        started = time.monotonic()
+
+        def run(job):
+            obj, field_name, name, url = job
+            start = time.monotonic()
+            status, attempts, error = check_url(
+                session, url, limiter,
+                opts["retries"], opts["timeout"], opts["backoff"],
+            )
+            return CheckResult(
+                model=type(obj).__name__,
+                pk=obj.pk,
+                field=field_name,
+                name=name,
+                url=url,
+                status=status,
+                ok=status == 200,
+                attempts=attempts,
+                error=error,
+                elapsed_ms=round((time.monotonic() - start) * 1000, 1),
+            )
+
+        with session, ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = {pool.submit(run, job): job for job in jobs}
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                label = f"{result.model} {result.pk} {result.name}"
+                if result.error:
+                    self.stdout.write(self.style.ERROR(
+                        f"[error] {label} {result.url} :: {result.error}"
+                    ))
+                elif not result.ok:
+                    self.stdout.write(self.style.ERROR(
+                        f"[bad status {result.status}] {label} {result.url}"
+                    ))
+
+        elapsed = time.monotonic() - started
+        results.sort(key=lambda r: (r.model, r.pk, r.field))
+        if opts["report"]:
+            write_report(opts["report"], results)
 
+        ok = sum(1 for r in results if r.ok)
+        errors = len(results) - ok
         self.stdout.write("")
-        self.stdout.write(self.style.SUCCESS(f"Checked: {checked}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked: {len(results) + missing} in {elapsed:.1f}s "
+            f"({concurrency} at a time)"
+        ))
         self.stdout.write(self.style.SUCCESS(f"OK: {ok}"))
         self.stdout.write(self.style.WARNING(f"No URL: {missing}"))
         if errors:
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from services.blobs import content_digest, known_blobs, storage_key
+from services.catalogue import bump_catalogue_version
+from services.models import MediaBlob, Service, ServiceImage
+
+TARGETS = ((Service, "img_path"), (ServiceImage, "image_url"))
+
+
+class Command(BaseCommand):
+    help = (
+        "Hash Service and ServiceImage media and point every field holding "
+        "identical bytes at one stored copy. Optionally deletes the copies "
+        "that are no longer referenced."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report duplicates without changing anything.",
+        )
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Delete duplicate files once nothing points at them.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Rows per bulk_update.",
+        )
+
+    def handle(self, *args, **opts):
+        dry = opts["dry_run"]
+        batch_size = max(opts["batch_size"], 1)
+        canonical = known_blobs()
+        digests = {name: digest for digest, name in canonical.items()}
+        sizes = {}
+        groups = {}  # digest -> [(obj, field_name, name)]
+        missing = 0
+
+        for model, field_name in TARGETS:
+            rows = model.objects.exclude(**{field_name: ""}).exclude(
+                **{f"{field_name}__isnull": True}
+            )
+            for obj in rows.iterator():
+                f = getattr(obj, field_name)
+                name = f.name
+                if name.startswith(("http://", "https://")):
+                    continue
+                digest = digests.get(name)
+                if digest is None:
+                    try:
+                        with f.open("rb") as handle:
+                            digest, sizes[name] = content_digest(handle)
+                    except Exception as e:
+                        self.stdout.write(
+                            self.style.WARNING(f"[missing] {obj}  {name}: {e}")
+                        )
+                        missing += 1
+                        continue
+                    digests[name] = digest
+                groups.setdefault(digest, []).append((obj, field_name, name))
+
+        pending = {}
+        replaced = set()
+        reclaimed = 0
+        for digest, refs in groups.items():
+            keep = canonical.get(digest) or refs[0][2]
+            if digest not in canonical and not dry:
+                MediaBlob.objects.create(
+                    digest=digest, storage=storage_key(), name=keep,
+                    size=sizes.get(keep, 0),
+                )
+            for obj, field_name, name in refs:
+                if name == keep:
+                    continue
+                if name not in replaced:
+                    replaced.add(name)
+                    reclaimed += sizes.get(name, 0)
+                    self.stdout.write(f"[dedupe] {name} -> {keep}")
+                setattr(obj, field_name, keep)
+                variants = obj.image_variants or {}
+                if variants.get("src") == name:
+                    # Renditions of identical bytes stay valid.
+                    obj.image_variants = {**variants, "src": keep}
+                pending.setdefault((type(obj), field_name), []).append(obj)
+
+        updated = 0
+        if not dry:
+            for (model, field_name), objs in pending.items():
+                model.objects.bulk_update(
+                    objs, [field_name, "image_variants"], batch_size=batch_size
+                )
+                updated += len(objs)
+            if updated:
+                # bulk_update sends no signals; refresh cached catalogue cards.
+                bump_catalogue_version()
+            if opts["delete"]:
+                # Every row holding a replaced name was repointed above.
+                for name in replaced:
+                    default_storage.delete(name)
+
+        self.stdout.write("")
+        self.stdout.write(self.style.NOTICE(f"Unique blobs         : {len(groups)}"))
+        self.stdout.write(self.style.NOTICE(f"Duplicate files      : {len(replaced)}"))
+        self.stdout.write(self.style.WARNING(f"Missing files        : {missing}"))
+        if dry:
+            self.stdout.write(self.style.HTTP_INFO(
+                f"[DRY RUN] Would repoint {sum(map(len, pending.values()))} rows"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rows updated         : {updated}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Reclaimable          : {reclaimed / 1e6:.2f} MB"
+            + (" (deleted)" if opts["delete"] and not dry else "")
+        ))
@@ -1,19 +1,29 @@
 from __future__ import annotations
 
+import json
 import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Iterable, Tuple
 
 from django.conf import settings
-from django.core.files.base import ContentFile
+from django.core.files import File
 from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand
-from django.db import transaction
 
-from services.models import Service, ServiceImage
+from services.blobs import (
+    blob_name, content_digest, known_blobs, storage_key,
+)
+from services.catalogue import bump_catalogue_version
+from services.models import MediaBlob, Service, ServiceImage
 
 logger = logging.getLogger(__name__)
 CLOUD_MARKER = "res.cloudinary.com"
+MODELS = {"Service": Service, "ServiceImage": ServiceImage}
+DEFAULT_CHECKPOINT = "media_migration.checkpoint"
 
 
 def is_cloudinary(url: str | None) -> bool:
@@ -36,10 +46,61 @@ def iter_targets() -> Iterable[Tuple[object, str]]:
         yield si, "image_url"
 
 
+def checkpoint_key(obj, field_name):
+    return f"{type(obj).__name__}:{obj.pk}:{field_name}"
+
+
+class Checkpoint:
+    """
+    Append-only JSON-lines record of finished uploads, so a rerun skips
+    files that already reached storage (and only replays their DB update).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as handle:
+                for line in handle:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line from a crash
+                    self.done[entry["key"]] = entry
+        self.handle = open(path, "a") if path else None
+
+    def record(self, key, source, stored):
+        entry = {"key": key, "source": source, "stored": stored}
+        with self.lock:
+            self.done[key] = entry
+            if self.handle:
+                self.handle.write(json.dumps(entry) + "\n")
+                self.handle.flush()
+
+    def close(self):
+        if self.handle:
+            self.handle.close()
+
+
+def file_digest(path):
+    """Return (digest, size) of a local file, read in chunks."""
+    with path.open("rb") as handle:
+        return content_digest(File(handle))
+
+
+def upload(name, path):
+    """Stream one local file to default storage; return the stored name."""
+    with path.open("rb") as handle:
+        return default_storage.save(name, File(handle, name=name))
+
+
 class Command(BaseCommand):
     help = (
         "Uploads local media (Service.img_path, ServiceImage.image_url) to Cloudinary "
-        "via default storage and updates the database fields. Skips already-remote files."
+        "via default storage and updates the database fields. Skips already-remote files. "
+        "Uploads run in parallel, identical files are uploaded once, and progress "
+        "is checkpointed so reruns resume."
     )
 
     def add_arguments(self, parser):
@@ -48,15 +109,55 @@ class Command(BaseCommand):
             action="store_true",
             help="Show actions without uploading or saving.",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Parallel uploads.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Rows per bulk_update.",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=DEFAULT_CHECKPOINT,
+            help="Checkpoint file recording finished uploads ('' to disable).",
+        )
+
+    def flush(self, pending, batch_size, force=False):
+        """bulk_update queued field changes per (model, field)."""
+        updated = 0
+        for (model, field_name), objs in pending.items():
+            if objs and (force or len(objs) >= batch_size):
+                model.objects.bulk_update(objs, [field_name], batch_size=batch_size)
+                updated += len(objs)
+                objs.clear()
+        return updated
 
     def handle(self, *args, **opts):
         dry = bool(opts.get("dry_run"))
+        batch_size = max(opts["batch_size"], 1)
+        checkpoint = Checkpoint(None if dry else opts["checkpoint"])
 
         already_cloud = 0
-        to_migrate = 0
+        resumed = 0
+        deduplicated = 0
         uploaded = 0
         missing = 0
         errors = 0
+        total_bytes = 0
+        # digest -> {"blob", "path", "size", "refs": [(obj, field, name)]}
+        jobs = {}
+        # Only blobs already held by the target storage can be reused.
+        known = known_blobs()
+        pending = {}
+
+        def queue_update(obj, field_name, stored_name):
+            setattr(obj, field_name, stored_name)
+            pending.setdefault((type(obj), field_name), []).append(obj)
 
         self.stdout.write(self.style.MIGRATE_HEADING("Scanning media..."))
 
@@ -74,55 +175,121 @@ class Command(BaseCommand):
                 continue
 
             name = getattr(f, "name", "") or ""
-            lp = local_path_for(name)
 
+            done = checkpoint.done.get(checkpoint_key(obj, field_name))
+            if done and done["source"] == name:
+                # Uploaded by an earlier run; only the DB update is missing.
+                queue_update(obj, field_name, done["stored"])
+                resumed += 1
+                continue
+            if done and done["stored"] == name:
+                already_cloud += 1
+                continue
+
+            lp = local_path_for(name)
             if not lp or not lp.exists():
                 self.stdout.write(self.style.WARNING(f"[missing] {obj}  {name}"))
                 missing += 1
                 continue
 
-            to_migrate += 1
-            self.stdout.write(f"[migrate] {obj}  {name}")
-
-            if dry:
-                uploaded += 1  # count as would upload
+            digest, size = file_digest(lp)
+            if digest in known or digest in jobs:
+                deduplicated += 1
+            if digest in known:
+                # Same bytes are already stored; just repoint the field.
+                if not dry:
+                    checkpoint.record(
+                        checkpoint_key(obj, field_name), name, known[digest]
+                    )
+                queue_update(obj, field_name, known[digest])
                 continue
 
-            try:
-                data = lp.read_bytes()  # read from local filesystem
-                stored_name = default_storage.save(name, ContentFile(data))  # goes to Cloudinary
-                setattr(obj, field_name, stored_name)
-                with transaction.atomic():
-                    obj.save(update_fields=[field_name])
-
-                # sanity: ensure URL is now Cloudinary
-                try:
-                    new_url = getattr(getattr(obj, field_name), "url", None)
-                except Exception:
-                    new_url = None
-
-                if is_cloudinary(new_url):
-                    self.stdout.write(self.style.SUCCESS(f"   OK: {new_url}"))
-                    uploaded += 1
-                else:
-                    self.stdout.write(
-                        self.style.ERROR(
-                            "   Upload complete but URL not Cloudinary; check storage/STORAGES."
+            if digest not in jobs:
+                self.stdout.write(f"[migrate] {obj}  {name}")
+            job = jobs.setdefault(digest, {
+                "blob": blob_name(digest, name),
+                "path": lp,
+                "size": size,
+                "refs": [],
+            })
+            job["refs"].append((obj, field_name, name))
+
+        to_migrate = len(jobs)
+        started = time.monotonic()
+        updated = 0
+
+        if not dry:
+            with ThreadPoolExecutor(max_workers=max(opts["workers"], 1)) as pool:
+                futures = {
+                    pool.submit(upload, job["blob"], job["path"]): digest
+                    for digest, job in jobs.items()
+                }
+                for future in as_completed(futures):
+                    digest = futures[future]
+                    job = jobs[digest]
+                    try:
+                        stored_name = future.result()
+                    except Exception as e:
+                        self.stdout.write(
+                            self.style.ERROR(f"   ERROR: {job['path']}: {e}")
                         )
+                        errors += 1
+                        continue
+                    MediaBlob.objects.get_or_create(
+                        digest=digest,
+                        storage=storage_key(),
+                        defaults={"name": stored_name, "size": job["size"]},
                     )
-                    errors += 1
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"   ERROR: {e}"))
-                errors += 1
+                    for obj, field_name, name in job["refs"]:
+                        checkpoint.record(
+                            checkpoint_key(obj, field_name), name, stored_name
+                        )
+                        queue_update(obj, field_name, stored_name)
+                    total_bytes += job["size"]
+                    updated += self.flush(pending, batch_size)
+
+                    # sanity: ensure URL is now Cloudinary
+                    try:
+                        new_url = default_storage.url(stored_name)
+                    except Exception:
+                        new_url = None
+                    if is_cloudinary(new_url):
+                        self.stdout.write(self.style.SUCCESS(f"   OK: {new_url}"))
+                        uploaded += 1
+                    else:
+                        self.stdout.write(
+                            self.style.ERROR(
+                                f"   Uploaded {stored_name} but URL not Cloudinary; "
+                                "check storage/STORAGES."
+                            )
+                        )
+                        errors += 1
+            updated += self.flush(pending, batch_size, force=True)
+            if updated:
+                # bulk_update sends no signals; refresh cached catalogue cards.
+                bump_catalogue_version()
+        checkpoint.close()
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        files_done = uploaded + errors if not dry else 0
 
         self.stdout.write("")
         self.stdout.write(self.style.NOTICE(f"Already on Cloudinary : {already_cloud}"))
         self.stdout.write(self.style.NOTICE(f"Need migration       : {to_migrate}"))
+        self.stdout.write(self.style.NOTICE(f"Resumed from checkpoint: {resumed}"))
+        self.stdout.write(self.style.NOTICE(f"Duplicates skipped   : {deduplicated}"))
         self.stdout.write(self.style.WARNING(f"Missing local files  : {missing}"))
         if dry:
-            self.stdout.write(self.style.HTTP_INFO(f"[DRY RUN] Would upload: {uploaded}"))
+            self.stdout.write(self.style.HTTP_INFO(f"[DRY RUN] Would upload: {to_migrate}"))
         else:
             self.stdout.write(self.style.SUCCESS(f"Uploaded             : {uploaded}"))
+            self.stdout.write(self.style.SUCCESS(f"Rows updated         : {updated}"))
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Throughput           : {total_bytes / 1e6 / elapsed:.2f} MB/s, "
+                    f"{files_done / elapsed:.1f} files/s over {elapsed:.1f}s"
+                )
+            )
             if errors:
                 self.stdout.write(self.style.ERROR(f"Errors               : {errors}"))
 
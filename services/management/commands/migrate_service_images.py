@@ -5,6 +5,7 @@ from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.core.management.base import BaseCommand
 
+from services.blobs import store_blob
 from services.models import Service
 
 logger = logging.getLogger(__name__)
@@ -66,8 +67,8 @@ class Command(BaseCommand):
                 migrated += 1
                 continue
 
-            # Upload to default storage
-            saved_path = default_storage.save(current_path, content)
+            # Upload to default storage; identical images are stored once
+            saved_path = store_blob(content, current_path)
             service.img_path.name = saved_path
             service.save(update_fields=["img_path"])
             logger.info("Uploaded and updated service %s to %s", service.id, saved_path)
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from services.catalogue import bump_catalogue_version
+from services.models import Review, Service
+
+ROLLUP_FIELDS = ["rating_count", "rating_sum"] + [
+    f"stars_{n}" for n in range(1, 6)
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Service rating rollups (count, sum and star histogram) "
+        "from the reviews table with one grouped query."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Rows per bulk_update batch.",
+        )
+
+    def handle(self, *args, **opts):
+        rows = Review.objects.values("service_id").annotate(
+            rating_count=Count("id"),
+            rating_sum=Sum("rating"),
+            **{
+                f"stars_{n}": Count("id", filter=Q(rating=n))
+                for n in range(1, 6)
+            },
+        ).order_by()
+        totals = {row.pop("service_id"): row for row in rows}
+
+        changed = []
+        for service in Service.objects.only("id", *ROLLUP_FIELDS):
+            expected = totals.get(service.id, {})
+            stale = False
+            for field in ROLLUP_FIELDS:
+                value = expected.get(field) or 0
+                if getattr(service, field) != value:
+                    setattr(service, field, value)
+                    stale = True
+            if stale:
+                changed.append(service)
+
+        with transaction.atomic():
+            Service.objects.bulk_update(
+                changed, ROLLUP_FIELDS, batch_size=opts["batch_size"]
+            )
+        if changed:
+            bump_catalogue_version()
+        self.stdout.write(
+            self.style.SUCCESS(f"Repaired rating rollups on {len(changed)} "
+                               f"service(s).")
+        )
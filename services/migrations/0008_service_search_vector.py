@@ -0,0 +1,60 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+GIN_INDEX = "services_service_search_gin"
+FTS_TABLE = "services_service_fts"
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            "UPDATE services_service AS s SET search_vector = "
+            "setweight(to_tsvector('english', coalesce(s.name, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(("
+            "SELECT c.name FROM services_servicecategory AS c "
+            "WHERE c.id = s.category_id), '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(s.description, '')), "
+            "'C')"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {GIN_INDEX} "
+            "ON services_service USING gin (search_vector)"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "name, category, description, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, category, description) "
+            "SELECT s.id, s.name, coalesce(c.name, ''), s.description "
+            "FROM services_service AS s "
+            "LEFT JOIN services_servicecategory AS c ON c.id = s.category_id"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {GIN_INDEX}")
+    elif vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("services", "0007_review"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="service",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,30 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+INDEX_NAME = "services_service_name_trgm"
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} "
+            "ON services_service USING gin (name gin_trgm_ops)"
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("services", "0008_service_search_vector"),
+    ]
+
+    operations = [
+        # Only runs on Postgres; other databases use services.trigram.
+        TrigramExtension(),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:29
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_rollups(apps, schema_editor):
+    Review = apps.get_model("services", "Review")
+    Service = apps.get_model("services", "Service")
+    rows = Review.objects.values("service_id").annotate(
+        count=Count("id"),
+        total=Sum("rating"),
+        **{
+            f"stars_{n}": Count("id", filter=Q(rating=n))
+            for n in range(1, 6)
+        },
+    )
+    for row in rows:
+        Service.objects.filter(pk=row["service_id"]).update(
+            rating_count=row["count"],
+            rating_sum=row["total"] or 0,
+            **{f"stars_{n}": row[f"stars_{n}"] for n in range(1, 6)},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0009_service_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='stars_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='stars_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='stars_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='stars_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='stars_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0010_service_rating_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['service', 'created_at', 'id'], name='services_review_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0013_media_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediablob',
+            name='storage',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='mediablob',
+            name='digest',
+            field=models.CharField(max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='mediablob',
+            constraint=models.UniqueConstraint(fields=('digest', 'storage'), name='unique_media_blob_per_storage'),
+        ),
+    ]
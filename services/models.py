@@ -2,8 +2,10 @@
 
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import F, Q
 
 # Create your models here.
 SERVICE_CATEGORY = [
@@ -22,6 +24,9 @@ class ServiceCategory(models.Model):
     slug = models.SlugField(max_length=30, unique=True)
     is_active = models.BooleanField(default=True)
 
+    # Fields shown by search suggestions (services.suggest).
+    SUGGESTION_FIELDS = ("is_active", "name")
+
     class Meta:
         """
         Meta options define model-level behavior.
@@ -37,6 +42,14 @@ class ServiceCategory(models.Model):
         """
         return f"{self.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._suggestion_fields = tuple(
+            instance.__dict__.get(name) for name in cls.SUGGESTION_FIELDS
+        )
+        return instance
+
 
 class Service(models.Model):
     category = models.ForeignKey(
@@ -61,6 +74,21 @@ class Service(models.Model):
     price = models.DecimalField(max_digits=4, decimal_places=2)
     is_bundle = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
+    # Weighted tsvector on Postgres, kept current by services.search.
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Resized renditions of img_path, written by services.images.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Review rollups, maintained by Review.save and the post_delete signal.
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    stars_1 = models.PositiveIntegerField(default=0, editable=False)
+    stars_2 = models.PositiveIntegerField(default=0, editable=False)
+    stars_3 = models.PositiveIntegerField(default=0, editable=False)
+    stars_4 = models.PositiveIntegerField(default=0, editable=False)
+    stars_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    # Fields shown by search suggestions (services.suggest).
+    SUGGESTION_FIELDS = ("is_active", "name", "slug")
 
     class Meta:
         """
@@ -77,6 +105,52 @@ class Service(models.Model):
         """
         return f"{self.name} (€{self.price})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._suggestion_fields = tuple(
+            instance.__dict__.get(name) for name in cls.SUGGESTION_FIELDS
+        )
+        return instance
+
+    @property
+    def rating_average(self):
+        """Mean review rating, or None when there are no reviews."""
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
+    @property
+    def rating_histogram(self):
+        """
+        Return [(stars, count, percent)] from 5 stars down to 1 for the
+        detail page's rating breakdown.
+        """
+        total = self.rating_count
+        return [
+            (
+                stars,
+                getattr(self, f"stars_{stars}"),
+                round(100 * getattr(self, f"stars_{stars}") / total)
+                if total else 0,
+            )
+            for stars in range(5, 0, -1)
+        ]
+
+    @classmethod
+    def adjust_rating(cls, service_id, rating, sign):
+        """
+        Add (sign=1) or remove (sign=-1) one rating from a service's
+        rollups with a single UPDATE using F() expressions.
+        """
+        changes = {
+            "rating_count": F("rating_count") + sign,
+            "rating_sum": F("rating_sum") + sign * rating,
+        }
+        if 1 <= rating <= 5:
+            changes[f"stars_{rating}"] = F(f"stars_{rating}") + sign
+        cls.objects.filter(pk=service_id).update(**changes)
+
 
 class ServiceImage(models.Model):
     service = models.ForeignKey(
@@ -86,6 +160,8 @@ class ServiceImage(models.Model):
     alt_text = models.TextField(max_length=120, blank=True)
     is_main = models.BooleanField(default=False)
     sort_order = models.PositiveIntegerField(default=0)
+    # Resized renditions of image_url, written by services.images.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         """
@@ -122,6 +198,32 @@ class ServiceImage(models.Model):
                 "Only one main image is allowed per service.")
 
 
+class MediaBlob(models.Model):
+    """
+    One stored copy of a media file, keyed by the SHA-256 of its bytes.
+
+    Service and ServiceImage fields holding identical content all point
+    at ``name`` (see services.blobs). ``storage`` is the backend holding
+    the copy, so a blob stored locally is never reused on Cloudinary.
+    """
+    digest = models.CharField(max_length=64)
+    storage = models.CharField(max_length=255, default="")
+    name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["digest", "storage"],
+                name="unique_media_blob_per_storage",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.digest[:12]} -> {self.name}"
+
+
 User = get_user_model()
 
 
@@ -143,6 +245,44 @@ class Review(models.Model):
     class Meta:
         ordering = ["-created_at"]
         unique_together = ("service", "user", "title")
+        indexes = [
+            # Serves keyset pagination of a service's reviews.
+            models.Index(
+                fields=["service", "created_at", "id"],
+                name="services_review_keyset_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.service.name}: {self.title} ({self.rating}/5)"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_rating = (
+            instance.__dict__.get("service_id"),
+            instance.__dict__.get("rating"),
+        )
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save the review and move its rating between the service rollups.
+        Deletions are handled by the post_delete signal so bulk and cascade
+        deletes are counted too.
+        """
+        current = (self.service_id, self.rating)
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = getattr(self, "_saved_rating", None) or (
+                    Review.objects.filter(pk=self.pk)
+                    .values_list("service_id", "rating")
+                    .first()
+                )
+            super().save(*args, **kwargs)
+            if previous != current:
+                if previous is not None and None not in previous:
+                    Service.adjust_rating(previous[0], previous[1], -1)
+                Service.adjust_rating(current[0], current[1], 1)
+        self._saved_rating = current
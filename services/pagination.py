@@ -0,0 +1,51 @@
+"""Keyset (cursor) pagination for service reviews.
+
+Reviews are listed newest first by (created_at, id). A cursor is the key
+of the last review shown, encoded as "<microseconds since epoch>.<id>",
+and the next page is everything strictly below it. Each page is an index
+range scan on (service, created_at, id), so page cost stays flat however
+many reviews a service has.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+REVIEWS_PAGE_SIZE = 10
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(review):
+    micros = (review.created_at - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}.{review.pk}"
+
+
+def decode_cursor(raw):
+    """Return (created_at, id) for a cursor string, or None if malformed."""
+    try:
+        micros, pk = (int(part) for part in (raw or "").split("."))
+    except ValueError:
+        return None
+    try:
+        created_at = EPOCH + timedelta(microseconds=micros)
+    except OverflowError:
+        return None
+    return created_at, pk
+
+
+def review_page(service, cursor=None, size=REVIEWS_PAGE_SIZE):
+    """Return (reviews, next cursor or None) for one page of a service."""
+    reviews = service.reviews.select_related("user").order_by(
+        "-created_at", "-id"
+    )
+    key = decode_cursor(cursor)
+    if key is not None:
+        created_at, pk = key
+        reviews = reviews.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    page = list(reviews[:size + 1])
+    if len(page) > size:
+        return page[:size], encode_cursor(page[size - 1])
+    return page, None
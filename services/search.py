@@ -0,0 +1,191 @@
+"""Full-text search over the service catalogue.
+
+Postgres keeps a weighted ``search_vector`` column (name > category >
+description) behind a GIN index and ranks matches with ``ts_rank``. SQLite
+mirrors the same fields into an FTS5 table using the porter tokenizer and
+ranks with ``bm25``. Both are kept current from the save/delete signals in
+``services.signals``. Other backends return None so the caller can fall
+back to a plain ``icontains`` filter.
+
+``fuzzy_search_services`` tolerates typos: Postgres uses pg_trgm word
+similarity behind a GIN trigram index, everything else a per-worker
+TrigramIndex rebuilt whenever the catalogue version changes.
+"""
+
+import re
+import threading
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramWordSimilarity,
+)
+from django.db import DatabaseError, connection
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .catalogue import catalogue_version
+from .models import Service
+from .trigram import TrigramIndex
+
+SEARCH_CONFIG = "english"
+FTS_TABLE = "services_service_fts"
+RESULT_LIMIT = 50
+
+WORD_RE = re.compile(r"\w+")
+
+
+def search_terms(query):
+    """Split a query into plain word tokens, dropping any search syntax."""
+    return WORD_RE.findall((query or "").lower())
+
+
+def _category_name(service):
+    if not service.category_id:
+        return ""
+    return service.category.name
+
+
+def _sqlite_fts_query(terms):
+    # Quoted prefix terms OR'd together; porter stems each one.
+    return " OR ".join(f'"{term}"*' for term in terms)
+
+
+def index_service(service):
+    """Refresh the search entry for one service."""
+    vendor = connection.vendor
+    if vendor == "postgresql":
+        vector = (
+            SearchVector("name", weight="A", config=SEARCH_CONFIG)
+            + SearchVector(
+                Value(_category_name(service)), weight="B",
+                config=SEARCH_CONFIG,
+            )
+            + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+        )
+        Service.objects.filter(pk=service.pk).update(search_vector=vector)
+    elif vendor == "sqlite":
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [service.pk]
+                )
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE} "
+                    "(rowid, name, category, description) "
+                    "VALUES (%s, %s, %s, %s)",
+                    [
+                        service.pk,
+                        service.name,
+                        _category_name(service),
+                        service.description,
+                    ],
+                )
+        except DatabaseError:
+            # SQLite built without FTS5; search falls back to icontains.
+            pass
+
+
+def unindex_service(service_id):
+    """Drop a deleted service from the SQLite FTS table."""
+    if connection.vendor != "sqlite":
+        return  # the Postgres vector is deleted with its row
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [service_id]
+            )
+    except DatabaseError:
+        pass
+
+
+def _ranked_ids_sqlite(terms, limit):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}, 10.0, 5.0, 1.0) LIMIT %s",
+                [_sqlite_fts_query(terms), limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+    except DatabaseError:
+        return None
+
+
+def _in_rank_order(queryset, ids):
+    """Filter queryset to ids, preserving the order of the id list."""
+    if not ids:
+        return queryset.none()
+    position = Case(
+        *[When(id=pk, then=Value(i)) for i, pk in enumerate(ids)],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(id__in=ids).order_by(position)
+
+
+def search_services(query, limit=RESULT_LIMIT):
+    """
+    Return active services matching query, best match first, or None when
+    the database has no full-text index to use.
+    """
+    terms = search_terms(query)
+    active = Service.objects.filter(is_active=True).select_related("category")
+    if not terms:
+        return active.none()
+
+    vendor = connection.vendor
+    if vendor == "postgresql":
+        search_query = SearchQuery(
+            " | ".join(f"{term}:*" for term in terms),
+            search_type="raw",
+            config=SEARCH_CONFIG,
+        )
+        return (
+            active.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F("search_vector"), search_query))
+            .order_by("-rank", "price", "id")[:limit]
+        )
+
+    if vendor == "sqlite":
+        ids = _ranked_ids_sqlite(terms, limit)
+        if ids is None:
+            return None
+        return _in_rank_order(active, ids)
+
+    return None
+
+
+_trigram_lock = threading.Lock()
+_trigram_cache = {"version": None, "index": None}
+
+
+def trigram_index():
+    """Return this worker's TrigramIndex, rebuilding it on a new version."""
+    version = catalogue_version()
+    with _trigram_lock:
+        if _trigram_cache["version"] != version:
+            rows = Service.objects.filter(is_active=True).values_list(
+                "id", "name", "category__name"
+            )
+            _trigram_cache["index"] = TrigramIndex(
+                (pk, f"{name} {category or ''}") for pk, name, category in rows
+            )
+            _trigram_cache["version"] = version
+        return _trigram_cache["index"]
+
+
+def fuzzy_search_services(query, limit=RESULT_LIMIT):
+    """Return active services similar to query, most similar first."""
+    active = Service.objects.filter(is_active=True).select_related("category")
+    if not search_terms(query):
+        return active.none()
+
+    if connection.vendor == "postgresql":
+        return (
+            active.filter(name__trigram_word_similar=query)
+            .annotate(similarity=TrigramWordSimilarity(query, "name"))
+            .order_by("-similarity", "price", "id")[:limit]
+        )
+
+    ids = [pk for pk, _score in trigram_index().search(query, limit)]
+    return _in_rank_order(active, ids)
@@ -0,0 +1,115 @@
+"""Signal handlers that keep cached catalogue data in step with the DB."""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.media import uses_cloudinary
+
+from .blobs import dedupe_upload
+from .catalogue import bump_catalogue_version
+from .images import needs_variants, schedule_variants
+from .models import Review, Service, ServiceCategory, ServiceImage
+from .search import index_service, unindex_service
+from .suggest import apply_change
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_save, sender=ServiceCategory)
+@receiver(post_delete, sender=ServiceCategory)
+@receiver(post_save, sender=ServiceImage)
+@receiver(post_delete, sender=ServiceImage)
+def invalidate_catalogue(sender, **kwargs):
+    bump_catalogue_version()
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    Service.adjust_rating(instance.service_id, instance.rating, -1)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def refresh_catalogue_ratings(sender, **kwargs):
+    # Rating rollups change via UPDATE, which sends no Service signals.
+    bump_catalogue_version()
+
+
+@receiver(post_save, sender=Service)
+def reindex_service(sender, instance, **kwargs):
+    index_service(instance)
+
+
+@receiver(post_delete, sender=Service)
+def drop_service_from_index(sender, instance, **kwargs):
+    unindex_service(instance.pk)
+
+
+@receiver(post_save, sender=ServiceCategory)
+def reindex_category_services(sender, instance, **kwargs):
+    for service in instance.services.select_related("category"):
+        index_service(service)
+
+
+@receiver(post_delete, sender=ServiceCategory)
+def reindex_orphaned_services(sender, instance, **kwargs):
+    # Deleting a category nulls Service.category without firing signals.
+    orphans = Service.objects.filter(category__isnull=True)
+    for service in orphans:
+        index_service(service)
+
+
+@receiver(post_save, sender=Service)
+def update_service_suggestion(sender, instance, **kwargs):
+    apply_change("service", instance)
+
+
+@receiver(post_delete, sender=Service)
+def drop_service_suggestion(sender, instance, **kwargs):
+    apply_change("service", instance, deleted=True)
+
+
+@receiver(post_save, sender=ServiceCategory)
+def update_category_suggestion(sender, instance, **kwargs):
+    apply_change("category", instance)
+
+
+@receiver(post_delete, sender=ServiceCategory)
+def drop_category_suggestion(sender, instance, **kwargs):
+    apply_change("category", instance, deleted=True)
+
+
+def refresh_image_variants(instance, field_name):
+    # Cloudinary resizes on delivery (core.media), so skip local renditions.
+    if uses_cloudinary() or not needs_variants(instance, field_name):
+        return
+    if getattr(instance, field_name):
+        schedule_variants(instance, field_name)
+    else:
+        type(instance).objects.filter(pk=instance.pk).update(
+            image_variants={}
+        )
+
+
+@receiver(post_save, sender=Service)
+def service_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_image_variants(instance, "img_path")
+
+
+@receiver(post_save, sender=ServiceImage)
+def gallery_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_image_variants(instance, "image_url")
+
+
+@receiver(pre_save, sender=Service)
+def dedupe_service_image(sender, instance, raw=False, **kwargs):
+    if not raw:
+        dedupe_upload(instance, "img_path")
+
+
+@receiver(pre_save, sender=ServiceImage)
+def dedupe_gallery_image(sender, instance, raw=False, **kwargs):
+    if not raw:
+        dedupe_upload(instance, "image_url")
@@ -0,0 +1,202 @@
+"""Prefix trie behind the search-as-you-type suggestions.
+
+Every worker keeps one SuggestionTrie of active service and category
+names. Each word of a name is a key ("Grooming Pack" is found by "gro" and
+by "pa"). A node remembers which entries sit below it and memoises its
+sorted top list, so a keystroke is a dict walk plus a slice.
+
+The trie is tagged with its own suggestion version, bumped only when a
+save or delete changes what suggestions show (a visible name, slug or
+is_active), so reviews, images and price edits leave tries alone. The
+signal patches this worker's trie in place and moves it to the new
+version; other workers notice the new version on their next lookup and
+rebuild from the database.
+"""
+
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+
+from .models import Service, ServiceCategory
+from .trigram import words
+
+SUGGESTION_LIMIT = 8
+KIND_ORDER = {"category": 0, "service": 1}
+
+
+class _Node:
+    __slots__ = ("children", "keys", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.keys = set()  # entry keys stored in this subtree
+        self.top = None  # memoised sorted entry keys
+
+
+class SuggestionTrie:
+    """
+    Prefix trie mapping word prefixes to suggestion entries.
+
+    Threads of a worker share one trie, so edits and lookups hold its lock.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self.entries = {}  # (kind, pk) -> {"label", "kind", "url"}
+        self.version = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _paths(self, label):
+        for word in set(words(label)):
+            node = self.root
+            path = [node]
+            for char in word:
+                node = node.children.setdefault(char, _Node())
+                path.append(node)
+            yield path
+
+    def add(self, kind, pk, label, url):
+        key = (kind, pk)
+        with self._lock:
+            self.discard(kind, pk)
+            self.entries[key] = {"label": label, "kind": kind, "url": url}
+            for path in self._paths(label):
+                for node in path:
+                    node.keys.add(key)
+                    node.top = None
+
+    def discard(self, kind, pk):
+        key = (kind, pk)
+        with self._lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return
+            for path in self._paths(entry["label"]):
+                for node in path:
+                    node.keys.discard(key)
+                    node.top = None
+
+    def complete(self, prefix, limit=SUGGESTION_LIMIT):
+        """Return up to limit entries with a word starting with prefix."""
+        with self._lock:
+            node = self.root
+            for char in prefix.lower():
+                node = node.children.get(char)
+                if node is None:
+                    return []
+            if node is self.root:
+                return []
+            if node.top is None:
+                node.top = sorted(
+                    node.keys,
+                    key=lambda key: (
+                        KIND_ORDER[key[0]],
+                        self.entries[key]["label"].lower(),
+                    ),
+                )
+            return [self.entries[key] for key in node.top[:limit]]
+
+
+def category_entry(category):
+    label = category.get_name_display()
+    url = f"{reverse('services:service_list')}?q={category.name}"
+    return label, url
+
+
+def service_entry(service):
+    url = reverse("services:service_detail", args=[service.slug])
+    return service.name, url
+
+
+def build_trie():
+    trie = SuggestionTrie()
+    for category in ServiceCategory.objects.filter(is_active=True):
+        trie.add("category", category.pk, *category_entry(category))
+    for service in Service.objects.filter(is_active=True).only(
+        "id", "name", "slug"
+    ):
+        trie.add("service", service.pk, *service_entry(service))
+    return trie
+
+
+SUGGESTION_VERSION_KEY = "services:suggestion-version"
+
+_lock = threading.Lock()
+_state = {"trie": None}
+
+
+def suggestion_version():
+    """Return the current suggestion version, creating one if missing."""
+    version = cache.get(SUGGESTION_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted key never reuses an old version.
+        cache.add(SUGGESTION_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(SUGGESTION_VERSION_KEY)
+    return version
+
+
+def _advance(previous):
+    """Bump the version; carry this worker's trie along if it was current."""
+    try:
+        version = cache.incr(SUGGESTION_VERSION_KEY)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(SUGGESTION_VERSION_KEY, version, None)
+    with _lock:
+        trie = _state["trie"]
+        # Only when no other process bumped in between.
+        if trie is not None and trie.version == previous == version - 1:
+            trie.version = version
+    return version
+
+
+def suggestion_trie():
+    """Return this worker's trie, rebuilding it if suggestions moved on."""
+    version = suggestion_version()
+    with _lock:
+        trie = _state["trie"]
+        if trie is None or trie.version != version:
+            trie = build_trie()
+            trie.version = version
+            _state["trie"] = trie
+        return trie
+
+
+def _visible(fields):
+    return bool(fields) and bool(fields[0])
+
+
+def apply_change(kind, instance, deleted=False):
+    """
+    Patch suggestions after a save/delete of a service or category.
+
+    Compares the suggestion fields loaded from the database with the
+    saved ones and does nothing when suggestions would not change.
+    Otherwise the version is bumped now and again on commit, so a worker
+    that rebuilt from pre-commit rows rebuilds once more.
+    """
+    before = getattr(instance, "_suggestion_fields", None)
+    after = None if deleted else tuple(
+        getattr(instance, name) for name in type(instance).SUGGESTION_FIELDS
+    )
+    instance._suggestion_fields = after
+    if before == after or not (_visible(before) or _visible(after)):
+        return
+    previous = suggestion_version()
+    with _lock:
+        trie = _state["trie"]
+        if trie is not None and trie.version == previous:
+            if not _visible(after):
+                trie.discard(kind, instance.pk)
+            elif kind == "category":
+                trie.add(kind, instance.pk, *category_entry(instance))
+            else:
+                trie.add(kind, instance.pk, *service_entry(instance))
+    current = _advance(previous)
+    transaction.on_commit(lambda: _advance(current))
@@ -0,0 +1,93 @@
+"""Template tags for responsive service images."""
+
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core.media import media_url, uses_cloudinary
+from services.images import VARIANT_WIDTHS
+
+register = template.Library()
+
+DEFAULT_SIZES = "100vw"
+
+
+def _srcset(renditions):
+    return ", ".join(f"{media_url(name)} {width}w" for width, name in renditions)
+
+
+def _img(src, attrs, extra=""):
+    img_attrs = format_html_join(" ", '{}="{}"', sorted(attrs.items()))
+    return format_html('<img src="{}" {}{}>', src, extra, img_attrs)
+
+
+@register.simple_tag
+def responsive_image(image, variants=None, sizes=DEFAULT_SIZES, **attrs):
+    """
+    Render an image with AVIF/WebP/JPEG srcsets from its stored variants.
+
+    On Cloudinary the srcset is built from f_auto/q_auto width transforms
+    instead. Otherwise it falls back to a plain <img> of the original when
+    variants have not been generated (or are stale). Extra keyword
+    arguments become <img> attributes; once variants exist, width/height
+    are replaced by the original's real dimensions so the aspect ratio is
+    exact.
+    """
+    if not image:
+        return ""
+    attrs.setdefault("loading", "lazy")
+    attrs.setdefault("decoding", "async")
+    record = variants or {}
+    current = record.get("src") == image.name
+    if current:
+        attrs["width"] = record["width"]
+        attrs["height"] = record["height"]
+
+    if uses_cloudinary():
+        srcset = ", ".join(
+            f"{media_url(image.name, width)} {width}w"
+            for width in VARIANT_WIDTHS
+        )
+        extra = format_html('srcset="{}" sizes="{}" ', srcset, sizes)
+        return _img(media_url(image.name, VARIANT_WIDTHS[1]), attrs, extra)
+
+    formats = record.get("variants") or {}
+    if not current or "jpeg" not in formats:
+        return _img(media_url(image.name), attrs)
+
+    jpeg = formats["jpeg"]
+    sources = format_html_join(
+        "",
+        '<source type="image/{}" srcset="{}" sizes="{}">',
+        (
+            (fmt, _srcset(formats[fmt]), sizes)
+            for fmt in ("avif", "webp")
+            if fmt in formats
+        ),
+    )
+    extra = format_html('srcset="{}" sizes="{}" ', _srcset(jpeg), sizes)
+    return format_html(
+        "<picture>{}{}</picture>",
+        sources,
+        _img(media_url(jpeg[-1][1]), attrs, extra),
+    )
+
+
+@register.simple_tag
+def service_image(service, image=None, sizes=DEFAULT_SIZES, **attrs):
+    """
+    Render a gallery image for a service. Without ``image`` this is the
+    main image from the prefetched ``main_images``, falling back to
+    Service.img_path; alt text defaults to the image's, then the service's.
+    """
+    if image is None:
+        main_images = getattr(service, "main_images", None)
+        image = main_images[0] if main_images else None
+    if image is None:
+        attrs.setdefault("alt", service.alt_text or service.name)
+        return responsive_image(
+            service.img_path, service.image_variants, sizes, **attrs
+        )
+    attrs.setdefault("alt", image.alt_text or service.alt_text or service.name)
+    return responsive_image(
+        image.image_url, image.image_variants, sizes, **attrs
+    )
@@ -1,9 +1,43 @@
-from django.test import TestCase
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from unittest.mock import PropertyMock, patch
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.fields.files import FieldFile
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+import requests
 from django.contrib.auth import get_user_model
 
 from orders.models import Order, OrderItem, Voucher
-from .models import ServiceCategory, Service, Review
+from orders.purchases import purchased_service_ids
+from .catalogue import (
+    LOCAL_CATALOGUE_TIMEOUT, catalogue_sections, catalogue_version,
+)
+from .management.commands.check_media_urls import backoff_delay
+from .models import (
+    MediaBlob, Review, Service, ServiceCategory, ServiceImage,
+)
+from .pagination import review_page
+from .search import fuzzy_search_services, search_services
+from .suggest import SuggestionTrie, suggestion_trie
+from .trigram import TrigramIndex
 
 
 class ServiceListViewTests(TestCase):
@@ -15,6 +49,7 @@ class ServiceListViewTests(TestCase):
         offers = ServiceCategory.objects.create(
             name="Offers", slug="offers"
         )
+        cache.clear()
 
         Service.objects.create(
             category=passes,
@@ -54,21 +89,249 @@ class ServiceListViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         # Context search_results should only include the matching service
         results = response.context["search_results"]
-        self.assertEqual(results.count(), 1)
-        self.assertEqual(results.first().name, "Groom Pack")
+        self.assertEqual([s.name for s in results], ["Groom Pack"])
+
+    def test_warm_catalogue_page_runs_no_queries(self):
+        url = reverse("services:service_list")
+        self.client.get(url)  # warms the catalogue cache
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, "Daycare 1")
+
+    def test_catalogue_cache_invalidated_on_service_save(self):
+        url = reverse("services:service_list")
+        self.client.get(url)
+        service = Service.objects.get(slug="daycare-1")
+        service.name = "Daycare Renamed"
+        service.save()
+        response = self.client.get(url)
+        self.assertContains(response, "Daycare Renamed")
+
+    def test_catalogue_version_bumps_again_on_commit(self):
+        service = Service.objects.get(slug="daycare-1")
+        with self.captureOnCommitCallbacks(execute=True):
+            service.save()
+            during = catalogue_version()
+        self.assertNotEqual(catalogue_version(), during)
+
+    def test_local_cache_entries_expire_quickly(self):
+        with patch.object(cache, "set", wraps=cache.set) as cache_set:
+            catalogue_sections()
+        timeouts = [
+            call.args[2] for call in cache_set.call_args_list
+            if call.args[0].startswith("services:catalogue:")
+        ]
+        self.assertEqual(timeouts, [LOCAL_CATALOGUE_TIMEOUT])
 
     def test_service_search_no_results_shows_message(self):
         response = self.client.get(
             reverse("services:service_list"), {"q": "cat"}
         )
         self.assertEqual(response.status_code, 200)
-        results = response.context["search_results"]
-        self.assertEqual(results.count(), 0)
+        self.assertEqual(response.context["search_results"], [])
         self.assertContains(response, "Try a different keyword")
 
+    def test_search_runs_the_matching_query_once(self):
+        url = reverse("services:service_list")
+        self.client.get(url)  # warms the catalogue cache
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, {"q": "groom"})
+        service_selects = [
+            q for q in ctx.captured_queries
+            if 'FROM "services_service"' in q["sql"]
+        ]
+        self.assertEqual(len(service_selects), 1)
+
+
+class ServiceSearchTests(TestCase):
+    def setUp(self):
+        packages = ServiceCategory.objects.create(
+            name="Packages", slug="packages"
+        )
+        passes = ServiceCategory.objects.create(name="Passes", slug="passes")
+        self.bath = Service.objects.create(
+            category=packages,
+            name="Bath Time",
+            slug="bath-time",
+            description="A wash and full grooming session.",
+            price=30,
+        )
+        self.groom = Service.objects.create(
+            category=packages,
+            name="Groom Pack",
+            slug="groom-pack",
+            description="Nails and brushing.",
+            price=20,
+        )
+        self.daycare = Service.objects.create(
+            category=passes,
+            name="Daycare",
+            slug="daycare",
+            description="Play all day.",
+            price=10,
+        )
+
+    def test_stemmed_terms_match_and_name_hits_rank_first(self):
+        results = search_services("grooming")
+        self.assertEqual(list(results), [self.groom, self.bath])
+
+    def test_category_name_is_searchable(self):
+        self.assertEqual(list(search_services("passes")), [self.daycare])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.daycare.name = "Playtime"
+        self.daycare.save()
+        self.assertEqual(list(search_services("playtime")), [self.daycare])
+
+        self.groom.delete()
+        self.assertEqual(list(search_services("groom")), [self.bath])
+
+    def test_search_syntax_is_treated_as_plain_words(self):
+        self.assertEqual(list(search_services('"bath" OR *')), [self.bath])
+        self.assertFalse(search_services("!!!").exists())
+
+
+class TrigramSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        packages = ServiceCategory.objects.create(
+            name="Packages", slug="packages"
+        )
+        self.groom = Service.objects.create(
+            category=packages,
+            name="Grooming Pack",
+            slug="grooming-pack",
+            description="Full groom.",
+            price=20,
+        )
+        self.daycare = Service.objects.create(
+            category=packages,
+            name="Daycare Pass",
+            slug="daycare-pass",
+            description="Play all day.",
+            price=10,
+        )
+
+    def test_index_ranks_closest_spelling_first(self):
+        index = TrigramIndex([(1, "Grooming Pack"), (2, "Groom Room")])
+        ranked = index.search("groming")
+        self.assertEqual(ranked[0][0], 1)
+        self.assertEqual(index.search("zzz"), [])
+
+    def test_misspelled_search_falls_back_to_close_matches(self):
+        response = self.client.get(
+            reverse("services:service_list"), {"q": "daycre"}
+        )
+        self.assertTrue(response.context["search_fuzzy"])
+        self.assertEqual(list(response.context["search_results"]),
+                         [self.daycare])
+        self.assertContains(response, "close match")
+
+    def test_worker_index_rebuilds_after_catalogue_change(self):
+        self.assertEqual(list(fuzzy_search_services("groming")),
+                         [self.groom])
+        self.groom.is_active = False
+        self.groom.save()
+        self.assertFalse(fuzzy_search_services("groming").exists())
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.passes = ServiceCategory.objects.create(
+            name="Passes", slug="passes"
+        )
+        self.groom = Service.objects.create(
+            category=self.passes,
+            name="Grooming Pack",
+            slug="grooming-pack",
+            description="Full groom.",
+            price=20,
+        )
+        self.url = reverse("services:autocomplete")
+
+    def labels(self, prefix):
+        response = self.client.get(self.url, {"q": prefix})
+        return [item["label"] for item in response.json()["suggestions"]]
+
+    def test_matches_any_word_prefix_categories_first(self):
+        self.assertEqual(self.labels("gro"), ["Grooming Pack"])
+        self.assertEqual(
+            self.labels("pa"), ["Day Care Passes", "Grooming Pack"]
+        )
+        self.assertEqual(self.labels("zzz"), [])
+
+    def test_warm_lookup_makes_no_queries(self):
+        self.labels("gro")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.labels("groo"), ["Grooming Pack"])
+
+    def test_saves_patch_the_trie_in_place(self):
+        self.labels("gro")
+        trie = suggestion_trie()
+        Service.objects.create(
+            category=self.passes,
+            name="Groomer Deluxe",
+            slug="groomer-deluxe",
+            description="More.",
+            price=40,
+        )
+        self.groom.is_active = False
+        self.groom.save()
+        self.assertIs(suggestion_trie(), trie)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.labels("gro"), ["Groomer Deluxe"])
+
+    def test_trie_survives_commits_and_unrelated_changes(self):
+        trie = suggestion_trie()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.groom.name = "Groomer Supreme"
+            self.groom.save()
+        self.assertIs(suggestion_trie(), trie)
+        self.assertEqual(self.labels("supreme"), ["Groomer Supreme"])
+
+        version = trie.version
+        with self.captureOnCommitCallbacks(execute=True):
+            self.groom.price = 99
+            self.groom.save()
+            Review.objects.create(
+                service=self.groom,
+                user=get_user_model().objects.create_user(username="r"),
+                rating=5, title="Nice", body="B" * 25,
+            )
+        self.assertIs(suggestion_trie(), trie)
+        self.assertEqual(trie.version, version)
+
+    def test_lookups_are_safe_during_concurrent_patches(self):
+        trie = SuggestionTrie()
+        errors = []
+        done = threading.Event()
+
+        def type_ahead():
+            while not done.is_set():
+                try:
+                    trie.complete("g")
+                except Exception as e:  # pragma: no cover - the failure case
+                    errors.append(e)
+                    return
+
+        reader = threading.Thread(target=type_ahead)
+        reader.start()
+        try:
+            for pk in range(3000):
+                trie.add("service", pk, f"Groom {pk}", "/")
+                if pk % 2:
+                    trie.discard("service", pk - 1)
+        finally:
+            done.set()
+            reader.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(trie.complete("groom", limit=3000)), 1500)
+
 
 class ReviewCrudTests(TestCase):
     def setUp(self):
+        cache.clear()
         User = get_user_model()
         self.user = User.objects.create_user(
             username="reviewer", email="reviewer@example.com", password="pass12345"
@@ -181,3 +444,712 @@ class ReviewCrudTests(TestCase):
         url = reverse("services:review_delete", args=[review.pk])
         response = self.client.post(url)
         self.assertEqual(response.status_code, 403)
+
+
+class RatingRollupTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username="rater", password="pass12345"
+        )
+        self.service = Service.objects.create(
+            name="Daycare 1", slug="daycare-1", description="A", price=10
+        )
+
+    def review(self, rating, title="Great"):
+        return Review.objects.create(
+            service=self.service,
+            user=self.user,
+            rating=rating,
+            title=title,
+            body="A" * 25,
+        )
+
+    def rollups(self):
+        self.service.refresh_from_db()
+        return (
+            self.service.rating_count,
+            self.service.rating_sum,
+            [self.service.stars_1, self.service.stars_2,
+             self.service.stars_3, self.service.stars_4,
+             self.service.stars_5],
+        )
+
+    def test_save_edit_and_delete_keep_rollups_in_step(self):
+        first = self.review(5)
+        self.review(3, title="Okay")
+        self.assertEqual(self.rollups(), (2, 8, [0, 0, 1, 0, 1]))
+
+        first = Review.objects.get(pk=first.pk)
+        first.rating = 4
+        first.save()
+        first.save()  # unchanged rating is not counted twice
+        self.assertEqual(self.rollups(), (2, 7, [0, 0, 1, 1, 0]))
+
+        Review.objects.filter(rating=3).delete()
+        self.assertEqual(self.rollups(), (1, 4, [0, 0, 0, 1, 0]))
+        self.assertEqual(self.service.rating_average, 4)
+
+    def test_detail_page_reads_rollups_without_aggregating(self):
+        self.review(4)
+        response = self.client.get(
+            reverse("services:service_detail", args=[self.service.slug])
+        )
+        self.assertContains(response, "Average 4.0/5")
+        self.assertContains(response, "Rating breakdown")
+
+    def test_recompute_command_repairs_drift(self):
+        self.review(2)
+        Service.objects.filter(pk=self.service.pk).update(
+            rating_count=9, rating_sum=40, stars_5=9, stars_2=0
+        )
+        call_command("recompute_ratings", stdout=StringIO())
+        self.assertEqual(self.rollups(), (1, 2, [0, 1, 0, 0, 0]))
+
+
+class ReviewPaginationTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username="rater", password="pass12345"
+        )
+        self.service = Service.objects.create(
+            name="Daycare 1", slug="daycare-1", description="A", price=10
+        )
+        for i in range(25):
+            Review.objects.create(
+                service=self.service,
+                user=self.user,
+                rating=5,
+                title=f"Review {i}",
+                body="A" * 25,
+            )
+        # Identical timestamps must still page cleanly on id.
+        Review.objects.update(created_at=timezone.now())
+
+    def test_cursor_walks_every_review_once_newest_first(self):
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = review_page(self.service, cursor)
+            seen.extend(review.pk for review in page)
+            if cursor is None:
+                break
+        expected = list(
+            Review.objects.order_by("-created_at", "-id")
+            .values_list("pk", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_detail_renders_first_page_and_fragment_continues(self):
+        response = self.client.get(
+            reverse("services:service_detail", args=[self.service.slug])
+        )
+        self.assertEqual(len(response.context["reviews"]), 10)
+        cursor = response.context["next_cursor"]
+        self.assertContains(response, "Load more reviews")
+
+        url = reverse("services:review_page", args=[self.service.slug])
+        with self.assertNumQueries(2):
+            fragment = self.client.get(url, {"after": cursor})
+        self.assertEqual(len(fragment.context["reviews"]), 10)
+        self.assertNotContains(fragment, "<html")
+
+    def test_malformed_cursor_starts_from_the_top(self):
+        first, _ = review_page(self.service)
+        page, _ = review_page(self.service, "not-a-cursor")
+        self.assertEqual(page, first)
+
+
+class PurchasedServicesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.user = User.objects.create_user(
+            username="buyer", password="pass12345"
+        )
+        self.service = Service.objects.create(
+            name="Daycare 1", slug="daycare-1", description="A", price=10
+        )
+        self.url = reverse(
+            "services:service_detail", args=[self.service.slug]
+        )
+        self.client.login(username="buyer", password="pass12345")
+
+    def buy(self):
+        order = Order.objects.create(user=self.user, is_paid=True)
+        item = OrderItem.objects.create(
+            order=order, service=self.service, quantity=1, price=10
+        )
+        return Voucher.objects.create(
+            service=self.service,
+            order_item=item,
+            user=self.user,
+            code="BUY1",
+            status="ISSUED",
+        )
+
+    def test_purchased_set_is_cached_and_bumped_by_new_vouchers(self):
+        self.assertEqual(purchased_service_ids(self.user), frozenset())
+        with self.assertNumQueries(0):
+            purchased_service_ids(self.user)
+
+        self.buy()
+        self.assertEqual(
+            purchased_service_ids(self.user), {self.service.id}
+        )
+        response = self.client.get(self.url)
+        self.assertTrue(response.context["user_can_review"])
+
+    def test_review_post_rechecks_a_stale_not_purchased_answer(self):
+        purchased_service_ids(self.user)  # cached before the voucher
+        # Issued by another worker: this process's version is not bumped.
+        with patch("orders.signals.purchases_changed"):
+            self.buy()
+        self.assertEqual(purchased_service_ids(self.user), frozenset())
+
+        self.client.post(
+            self.url, {"rating": 5, "title": "Great", "body": "B" * 25}
+        )
+        self.assertTrue(
+            Review.objects.filter(user=self.user, service=self.service).exists()
+        )
+        self.assertEqual(
+            purchased_service_ids(self.user), {self.service.id}
+        )
+
+    def test_listing_marks_purchased_services(self):
+        self.buy()
+        response = self.client.get(reverse("services:service_list"))
+        self.assertEqual(
+            response.context["purchased_ids"], {self.service.id}
+        )
+
+
+class CatalogueRatingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = ServiceCategory.objects.create(
+            name="Passes", slug="passes"
+        )
+        self.user = get_user_model().objects.create_user(
+            username="rater", password="pass12345"
+        )
+
+    def add_rated_services(self, start, stop):
+        for i in range(start, stop):
+            service = Service.objects.create(
+                category=self.category,
+                name=f"Daycare {i}",
+                slug=f"daycare-{i}",
+                description="Play all day.",
+                price=10 + i,
+            )
+            Review.objects.create(
+                service=service,
+                user=self.user,
+                rating=4,
+                title="Good",
+                body="A" * 25,
+            )
+
+    def queries_for_listing(self, params=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                reverse("services:service_list"), params or {}
+            )
+        self.assertContains(response, "Rating: 4.0/5 (1 review)")
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_services(self):
+        self.add_rated_services(0, 2)
+        few = self.queries_for_listing()
+        few_search = self.queries_for_listing({"q": "daycare"})
+        self.add_rated_services(2, 8)
+        self.assertEqual(self.queries_for_listing(), few)
+        self.assertEqual(self.queries_for_listing({"q": "daycare"}),
+                         few_search)
+
+    def test_new_review_refreshes_cached_cards(self):
+        self.add_rated_services(0, 1)
+        self.client.get(reverse("services:service_list"))
+        Review.objects.create(
+            service=Service.objects.get(),
+            user=self.user,
+            rating=2,
+            title="Meh",
+            body="B" * 25,
+        )
+        response = self.client.get(reverse("services:service_list"))
+        self.assertContains(response, "Rating: 3.0/5 (2 reviews)")
+
+
+def png_upload(name="dog.png", size=(800, 600)):
+    buffer = BytesIO()
+    Image.new("RGB", size, (200, 120, 40)).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), "image/png")
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def create_service(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            service = Service.objects.create(
+                name="Bath Time",
+                slug="bath-time",
+                description="A",
+                price=10,
+                img_path=png_upload(),
+            )
+        service.refresh_from_db()
+        return service
+
+    def test_upload_generates_smaller_renditions_per_format(self):
+        record = self.create_service().image_variants
+        self.assertEqual((record["width"], record["height"]), (800, 600))
+        self.assertEqual(
+            [width for width, _name in record["variants"]["jpeg"]],
+            [320, 640],
+        )
+        self.assertIn("webp", record["variants"])
+
+    def test_tag_renders_srcset_and_falls_back_without_variants(self):
+        service = self.create_service()
+        html = Template(
+            "{% load service_images %}"
+            "{% responsive_image s.img_path s.image_variants alt='Dog' %}"
+        ).render(Context({"s": service}))
+        self.assertIn("<picture>", html)
+        self.assertIn('type="image/webp"', html)
+        self.assertIn("-640.jpg 640w", html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn('width="800"', html)
+
+        service.image_variants = {}
+        html = Template(
+            "{% load service_images %}"
+            "{% responsive_image s.img_path s.image_variants %}"
+        ).render(Context({"s": service}))
+        self.assertNotIn("<picture>", html)
+        self.assertIn(service.img_path.url, html)
+
+    def test_backfill_command_fills_missing_variants(self):
+        service = self.create_service()
+        Service.objects.filter(pk=service.pk).update(image_variants={})
+        call_command(
+            "backfill_image_variants", "--workers", "0", stdout=StringIO()
+        )
+        service.refresh_from_db()
+        self.assertEqual(service.image_variants["src"], service.img_path.name)
+
+    def test_rows_sharing_a_blob_share_renditions(self):
+        first = self.create_service()
+        default_storage.reset_counts()
+        with self.captureOnCommitCallbacks(execute=True):
+            second = Service.objects.create(
+                name="Bath Again",
+                slug="bath-again",
+                description="A",
+                price=10,
+                img_path=png_upload("copy.png"),
+            )
+        second.refresh_from_db()
+        self.assertEqual(second.img_path.name, first.img_path.name)
+        self.assertEqual(second.image_variants, first.image_variants)
+        self.assertEqual(default_storage.counts["save"], 0)
+
+    def test_backfill_renders_each_shared_source_once(self):
+        first = self.create_service()
+        for i in range(2):
+            Service.objects.create(
+                name=f"Copy {i}", slug=f"copy-{i}", description="A",
+                price=10, img_path=first.img_path.name,
+            )
+        Service.objects.update(image_variants={})
+        default_storage.reset_counts()
+        out = StringIO()
+        call_command(
+            "backfill_image_variants", "--workers", "0", stdout=out
+        )
+        self.assertIn("Generated: 3, Reused: 0, Skipped: 0", out.getvalue())
+        renditions = sum(
+            len(widths) for widths in
+            Service.objects.get(pk=first.pk).image_variants["variants"]
+            .values()
+        )
+        self.assertEqual(default_storage.counts["save"], renditions)
+        self.assertEqual(
+            {s.image_variants["src"] for s in Service.objects.all()},
+            {first.img_path.name},
+        )
+
+        Service.objects.exclude(pk=first.pk).update(image_variants={})
+        default_storage.reset_counts()
+        out = StringIO()
+        call_command(
+            "backfill_image_variants", "--workers", "0", stdout=out
+        )
+        self.assertIn("Generated: 0, Reused: 2, Skipped: 0", out.getvalue())
+        self.assertEqual(default_storage.counts["save"], 0)
+
+    def test_backfill_skips_images_that_fail_to_render(self):
+        broken = Service.objects.create(
+            name="Broken",
+            slug="broken",
+            description="A",
+            price=10,
+            img_path=default_storage.save(
+                "services/broken.png", ContentFile(b"not an image")
+            ),
+        )
+        service = self.create_service()
+        Service.objects.filter(pk=service.pk).update(image_variants={})
+        out = StringIO()
+        with self.assertLogs(
+            "services.management.commands.backfill_image_variants", "ERROR"
+        ):
+            call_command("backfill_image_variants", "--workers", "0",
+                         stdout=out)
+        self.assertIn("Generated: 1, Reused: 0, Skipped: 1", out.getvalue())
+        service.refresh_from_db()
+        self.assertEqual(service.image_variants["src"], service.img_path.name)
+        broken.refresh_from_db()
+        self.assertEqual(broken.image_variants, {})
+
+
+class ServiceGalleryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = ServiceCategory.objects.create(
+            name="Passes", slug="passes"
+        )
+
+    def add_service(self, i, images=2):
+        service = Service.objects.create(
+            category=self.category,
+            name=f"Daycare {i}",
+            slug=f"daycare-{i}",
+            description="Play all day.",
+            price=10 + i,
+        )
+        for order in range(images):
+            ServiceImage.objects.create(
+                service=service,
+                image_url=f"services/gallery-{i}-{order}.jpg",
+                alt_text=f"Gallery {i}-{order}",
+                is_main=order == 1,
+                sort_order=images - order,
+            )
+        return service
+
+    def listing_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("services:service_list"))
+        return len(ctx.captured_queries), response
+
+    def test_listing_shows_main_images_with_constant_queries(self):
+        self.add_service(0)
+        few, response = self.listing_queries()
+        self.assertContains(response, 'alt="Gallery 0-1"')
+        self.assertNotContains(response, 'alt="Gallery 0-0"')
+        for i in range(1, 6):
+            self.add_service(i)
+        many, response = self.listing_queries()
+        self.assertEqual(many, few)
+        self.assertContains(response, 'alt="Gallery 5-1"')
+
+    def test_detail_renders_ordered_gallery_with_one_prefetch(self):
+        service = self.add_service(0, images=3)
+        with self.assertNumQueries(3):
+            # service, gallery prefetch, first review page
+            response = self.client.get(
+                reverse("services:service_detail", args=[service.slug])
+            )
+        gallery = [
+            image.alt_text for image in response.context["service"].gallery
+        ]
+        self.assertEqual(
+            gallery, ["Gallery 0-2", "Gallery 0-1", "Gallery 0-0"]
+        )
+        self.assertEqual(
+            response.context["main_image"].alt_text, "Gallery 0-1"
+        )
+        self.assertContains(response, 'aria-label="Gallery"')
+
+
+class _MediaHandler(BaseHTTPRequestHandler):
+    hits = {}
+
+    def _respond(self, head):
+        path = self.path
+        count = self.hits[path] = self.hits.get(path, 0) + 1
+        if path == "/flaky.jpg" and count == 1:
+            status = 503
+        elif path == "/nohead.jpg" and head:
+            status = 405
+        elif path in ("/ok.jpg", "/flaky.jpg", "/nohead.jpg"):
+            status = 200
+        else:
+            status = 404
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._respond(head=True)
+
+    def do_GET(self):
+        self._respond(head=False)
+
+    def log_message(self, *args):
+        pass
+
+
+class CheckMediaUrlsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _MediaHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        _MediaHandler.hits = {}
+        service = Service.objects.create(
+            name="Bath", slug="bath", description="A", price=10,
+            img_path=f"{self.base}/ok.jpg",
+        )
+        for name in ("flaky.jpg", "nohead.jpg", "missing.jpg"):
+            ServiceImage.objects.create(
+                service=service, image_url=f"{self.base}/{name}"
+            )
+        report_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, report_dir, ignore_errors=True)
+        self.report_dir = report_dir
+
+    def run_check(self, report):
+        path = f"{self.report_dir}/{report}"
+        out = StringIO()
+        call_command(
+            "check_media_urls", "--concurrency", "4", "--retries", "2",
+            "--backoff", "0.01", "--report", path, stdout=out,
+        )
+        return path, out.getvalue()
+
+    def test_concurrent_check_retries_and_writes_json_report(self):
+        path, output = self.run_check("report.json")
+        with open(path) as handle:
+            rows = {row["name"].rsplit("/", 1)[1]: row
+                    for row in json.load(handle)}
+        self.assertEqual(rows["ok.jpg"]["status"], 200)
+        self.assertEqual(
+            (rows["flaky.jpg"]["status"], rows["flaky.jpg"]["attempts"]),
+            (200, 2),
+        )
+        self.assertEqual(rows["nohead.jpg"]["status"], 200)
+        self.assertFalse(rows["missing.jpg"]["ok"])
+        self.assertIn("Errors/Bad status: 1", output)
+
+    def test_backoff_honours_retry_after_on_error_responses(self):
+        response = requests.Response()
+        response.status_code = 429
+        response.headers["Retry-After"] = "7"
+        self.assertFalse(response)  # error responses are falsy
+        self.assertEqual(backoff_delay(0, 0.01, response), 7.0)
+        self.assertLessEqual(backoff_delay(0, 0.01, None), 0.01)
+
+    @override_settings(
+        STORAGES={
+            "default": {
+                "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage"
+            },
+            "staticfiles": {
+                "BACKEND":
+                    "django.contrib.staticfiles.storage.StaticFilesStorage"
+            },
+        },
+        CLOUDINARY_STORAGE={
+            "CLOUDINARY_CLOUD_NAME": "demo",
+            "CLOUDINARY_API_KEY": "key",
+            "CLOUDINARY_API_SECRET": "secret",
+        },
+    )
+    def test_checks_untransformed_cloudinary_urls(self):
+        ServiceImage.objects.all().delete()
+        Service.objects.update(img_path="services/dog.jpg")
+        original = "https://res.cloudinary.com/demo/image/upload/v1/dog.jpg"
+        checked = []
+
+        def fake_check(session, url, *args):
+            checked.append(url)
+            return 200, 1, ""
+
+        with patch(
+            "services.management.commands.check_media_urls.check_url",
+            fake_check,
+        ), patch.object(
+            FieldFile, "url", new_callable=PropertyMock, return_value=original
+        ):
+            call_command("check_media_urls", stdout=StringIO())
+        self.assertEqual(checked, [original])
+
+    def test_csv_report(self):
+        path, _output = self.run_check("report.csv")
+        with open(path, newline="") as handle:
+            rows = list(csv.DictReader(handle))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(sum(row["ok"] == "True" for row in rows), 3)
+
+
+@override_settings(
+    STORAGES={
+        "default": {
+            "BACKEND": "django.core.files.storage.InMemoryStorage"
+        },
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+        },
+    }
+)
+class MigrateMediaTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.checkpoint = f"{self.media}/migration.checkpoint"
+        os.makedirs(f"{self.media}/services")
+        self.services = []
+        for i in range(3):
+            name = f"services/photo-{i}.jpg"
+            with open(f"{self.media}/{name}", "wb") as handle:
+                handle.write(b"x" * 1024)
+            self.services.append(
+                Service.objects.create(
+                    name=f"Svc {i}", slug=f"svc-{i}", description="A",
+                    price=10, img_path=name,
+                )
+            )
+
+    def migrate(self):
+        out = StringIO()
+        call_command(
+            "migrate_media_to_cloudinary", "--workers", "3",
+            "--batch-size", "2", "--checkpoint", self.checkpoint, stdout=out,
+        )
+        return out.getvalue()
+
+    def test_parallel_upload_records_checkpoint_and_reports_throughput(self):
+        output = self.migrate()
+        self.assertIn("MB/s", output)
+        self.assertIn("Rows updated         : 3", output)
+        with open(self.checkpoint) as handle:
+            self.assertEqual(len(handle.readlines()), 3)
+        # All three files hold the same bytes, so only one was uploaded.
+        self.assertIn("Duplicates skipped   : 2", output)
+        self.assertEqual(MediaBlob.objects.count(), 1)
+        for service in self.services:
+            service.refresh_from_db()
+            self.assertTrue(default_storage.exists(service.img_path.name))
+
+    def test_blobs_held_by_another_storage_are_not_reused(self):
+        digest = hashlib.sha256(b"x" * 1024).hexdigest()
+        MediaBlob.objects.create(
+            digest=digest,
+            storage="django.core.files.storage.FileSystemStorage",
+            name="services/blobs/local-only.jpg",
+        )
+        self.migrate()
+        for service in self.services:
+            service.refresh_from_db()
+            self.assertNotEqual(
+                service.img_path.name, "services/blobs/local-only.jpg"
+            )
+            self.assertTrue(default_storage.exists(service.img_path.name))
+        self.assertTrue(MediaBlob.objects.filter(
+            digest=digest,
+            storage="django.core.files.storage.InMemoryStorage",
+        ).exists())
+
+    def test_rerun_replays_checkpointed_db_updates_without_uploading(self):
+        self.migrate()
+        # Simulate a crash after uploading but before the DB update landed.
+        Service.objects.filter(pk=self.services[0].pk).update(
+            img_path="services/photo-0.jpg"
+        )
+        output = self.migrate()
+        self.assertIn("Resumed from checkpoint: 1", output)
+        self.assertIn("Need migration       : 0", output)
+        self.services[0].refresh_from_db()
+        with open(self.checkpoint) as handle:
+            entries = [json.loads(line) for line in handle]
+        stored = next(
+            e["stored"] for e in entries
+            if e["key"] == f"Service:{self.services[0].pk}:img_path"
+        )
+        self.assertEqual(self.services[0].img_path.name, stored)
+
+
+class MediaDedupeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        default_storage.reset_counts()
+
+    def test_identical_uploads_share_one_blob(self):
+        first = Service.objects.create(
+            name="Bath", slug="bath", description="A", price=10,
+            img_path=png_upload("bath.png"),
+        )
+        second = Service.objects.create(
+            name="Groom", slug="groom", description="A", price=10,
+            img_path=png_upload("groom.png"),
+        )
+        gallery = ServiceImage.objects.create(
+            service=first, image_url=png_upload("gallery.png")
+        )
+        self.assertEqual(first.img_path.name, second.img_path.name)
+        self.assertEqual(gallery.image_url.name, first.img_path.name)
+        self.assertIn("/blobs/", first.img_path.name)
+        self.assertEqual(MediaBlob.objects.count(), 1)
+        self.assertEqual(default_storage.counts["save"], 1)
+
+        other = Service.objects.create(
+            name="Walk", slug="walk", description="A", price=10,
+            img_path=png_upload("walk.png", size=(640, 480)),
+        )
+        self.assertNotEqual(other.img_path.name, first.img_path.name)
+
+    def test_command_collapses_existing_duplicates(self):
+        names = [
+            default_storage.save(f"services/dedupe-{key}.jpg", ContentFile(data))
+            for key, data in [("a", b"same"), ("b", b"same"), ("c", b"other")]
+        ]
+        services = [
+            Service.objects.create(
+                name=f"Svc {i}", slug=f"svc-{i}", description="A",
+                price=10, img_path=name,
+            )
+            for i, name in enumerate(names)
+        ]
+
+        out = StringIO()
+        call_command("dedupe_media", "--delete", stdout=out)
+
+        for service in services:
+            service.refresh_from_db()
+        self.assertEqual(services[1].img_path.name, names[0])
+        self.assertEqual(services[2].img_path.name, names[2])
+        self.assertFalse(default_storage.exists(names[1]))
+        self.assertEqual(MediaBlob.objects.count(), 2)
+        self.assertIn("Duplicate files      : 1", out.getvalue())
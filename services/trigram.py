@@ -0,0 +1,78 @@
+"""In-process trigram index for typo-tolerant catalogue search.
+
+Mirrors pg_trgm: each lowercased word is padded with two leading spaces and
+one trailing space, then split into trigrams. A query word matches a
+document word when their Jaccard similarity reaches the threshold; a
+document's score is the mean of its best score for each query word. An
+inverted trigram -> word index keeps lookups proportional to the
+vocabulary touched by the query rather than the size of the catalogue.
+"""
+
+import re
+from collections import defaultdict
+
+WORD_RE = re.compile(r"[^\W_]+")
+SIMILARITY_THRESHOLD = 0.3  # pg_trgm.similarity_threshold default
+
+
+def trigrams(word):
+    """Return the pg_trgm style trigram set for a single word."""
+    padded = f"  {word.lower()} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def words(text):
+    return WORD_RE.findall((text or "").lower())
+
+
+class TrigramIndex:
+    """Immutable trigram index over (doc_id, text) pairs."""
+
+    def __init__(self, documents):
+        self.word_trigrams = {}  # word -> trigram set
+        self.word_docs = defaultdict(set)  # word -> doc ids
+        self.postings = defaultdict(list)  # trigram -> words
+        for doc_id, text in documents:
+            for word in words(text):
+                if word not in self.word_trigrams:
+                    grams = trigrams(word)
+                    self.word_trigrams[word] = grams
+                    for gram in grams:
+                        self.postings[gram].append(word)
+                self.word_docs[word].add(doc_id)
+
+    def __len__(self):
+        return len(self.word_trigrams)
+
+    def _similar_words(self, word, threshold):
+        """Yield (word, similarity) for indexed words close to word."""
+        query = trigrams(word)
+        shared = defaultdict(int)
+        for gram in query:
+            for candidate in self.postings.get(gram, ()):
+                shared[candidate] += 1
+        for candidate, common in shared.items():
+            union = len(query) + len(self.word_trigrams[candidate]) - common
+            similarity = common / union
+            if similarity >= threshold:
+                yield candidate, similarity
+
+    def search(self, query, limit=None, threshold=SIMILARITY_THRESHOLD):
+        """Return [(doc_id, score)] best first, ties broken by doc id."""
+        terms = words(query)
+        if not terms:
+            return []
+        totals = defaultdict(float)
+        for term in terms:
+            best = {}
+            for word, similarity in self._similar_words(term, threshold):
+                for doc_id in self.word_docs[word]:
+                    if similarity > best.get(doc_id, 0.0):
+                        best[doc_id] = similarity
+            for doc_id, similarity in best.items():
+                totals[doc_id] += similarity
+        ranked = sorted(
+            ((doc_id, total / len(terms)) for doc_id, total in totals.items()),
+            key=lambda item: (-item[1], item[0]),
+        )
+        return ranked[:limit] if limit else ranked
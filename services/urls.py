@@ -5,7 +5,13 @@ app_name = "services"
 
 urlpatterns = [
     path("", views.service_list, name="service_list"),
+    path("autocomplete/", views.autocomplete, name="autocomplete"),
     path("reviews/<int:pk>/edit/", views.review_edit, name="review_edit"),
     path("reviews/<int:pk>/delete/", views.review_delete, name="review_delete"),
     path("<slug:slug>/", views.service_detail, name="service_detail"),
+    path(
+        "<slug:slug>/reviews/",
+        views.review_page_fragment,
+        name="review_page",
+    ),
 ]
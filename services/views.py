@@ -2,12 +2,20 @@
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Avg, Count
+from django.db.models import Q
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, JsonResponse
+from .catalogue import (
+    catalogue_sections,
+    gallery_prefetch,
+    main_image_prefetch,
+)
 from .models import Service, Review
+from .pagination import review_page
+from .search import fuzzy_search_services, search_services
+from .suggest import suggestion_trie
 from .forms import ReviewForm
-from orders.models import Voucher
+from orders.purchases import has_purchased, purchased_service_ids
 
 
 def home(request):
@@ -24,78 +32,113 @@ def service_list(request):
         or ""
     ).strip()
 
-    # Base queryset
-    services_qs = Service.objects.filter(is_active=True).select_related(
-        "category"
-    )
-
     search_results = []
+    fuzzy = False
 
     if query:
-        # Loosen search to catch stems (e.g., "grooming" -> "groom")
-        terms = set()
-        for part in query.split():
-            terms.add(part)
-            if part.endswith("ing") and len(part) > 4:
-                terms.add(part[:-3])
-            if part.endswith("es") and len(part) > 3:
-                terms.add(part[:-2])
-            if part.endswith("s") and len(part) > 3:
-                terms.add(part[:-1])
-        terms.add(query)
-        terms = [t for t in terms if t]
-
-        search_filter = Q()
-        for term in terms:
-            search_filter |= (
-                Q(name__icontains=term)
-                | Q(description__icontains=term)
-                | Q(category__name__icontains=term)
+        matches = search_services(query)
+        if matches is None:
+            matches = icontains_search(query)
+        # Evaluate once, prefetch included, so the emptiness test does not
+        # run the search a second time.
+        search_results = list(matches.prefetch_related(main_image_prefetch()))
+        if not search_results:
+            # Nothing matched exactly; try close spellings instead.
+            search_results = list(
+                fuzzy_search_services(query).prefetch_related(
+                    main_image_prefetch()
+                )
             )
+            fuzzy = True
 
-        search_results = services_qs.filter(search_filter).order_by(
-            "category__name", "price"
-        )
-
-    # Always show full categories, even when searching
-    passes = services_qs.filter(category__name="Passes").order_by("price")
-    packages = services_qs.filter(category__name="Packages").order_by("price")
-    offers = services_qs.filter(category__name="Offers").order_by("price")
+    # Always show full categories, even when searching; one cached query.
+    sections = catalogue_sections()
 
     context = {
-        "doggy_daycare_pass": passes,
-        "doggy_grooming_packs": packages,
-        "pet_offers": offers,
+        "doggy_daycare_pass": sections["Passes"],
+        "doggy_grooming_packs": sections["Packages"],
+        "pet_offers": sections["Offers"],
         "search_query": query,
         "search_results": search_results,
+        "search_fuzzy": fuzzy,
+        "purchased_ids": purchased_service_ids(request.user),
     }
 
     return render(request, "services/service_list.html", context)
 
 
+def icontains_search(query):
+    """Fallback search for databases without a full-text index."""
+    # Loosen search to catch stems (e.g., "grooming" -> "groom")
+    terms = set()
+    for part in query.split():
+        terms.add(part)
+        if part.endswith("ing") and len(part) > 4:
+            terms.add(part[:-3])
+        if part.endswith("es") and len(part) > 3:
+            terms.add(part[:-2])
+        if part.endswith("s") and len(part) > 3:
+            terms.add(part[:-1])
+    terms.add(query)
+    terms = [t for t in terms if t]
+
+    search_filter = Q()
+    for term in terms:
+        search_filter |= (
+            Q(name__icontains=term)
+            | Q(description__icontains=term)
+            | Q(category__name__icontains=term)
+        )
+
+    return (
+        Service.objects.filter(is_active=True)
+        .select_related("category")
+        .filter(search_filter)
+        .order_by("category__name", "price")
+    )
+
+
+def autocomplete(request):
+    """Return JSON name suggestions for the search box, served from memory."""
+    prefix = request.GET.get("q", "").strip()
+    suggestions = []
+    if prefix:
+        # Suggest on the word being typed.
+        suggestions = suggestion_trie().complete(prefix.split()[-1])
+    return JsonResponse({"suggestions": suggestions})
+
+
 def service_detail(request, slug):
     """Display details for a single service."""
     service = get_object_or_404(
-        Service.objects.select_related("category"),
+        Service.objects.select_related("category").prefetch_related(
+            gallery_prefetch()
+        ),
         slug=slug,
         is_active=True,
     )
-    reviews = service.reviews.select_related("user")
-    rating_stats = service.reviews.aggregate(
-        average=Avg("rating"), count=Count("id")
+    main_image = next(
+        (image for image in service.gallery if image.is_main), None
     )
+    reviews, next_cursor = review_page(
+        service, request.GET.get("reviews_after")
+    )
+    # Read from the maintained rollups instead of aggregating reviews.
+    rating_stats = {
+        "average": service.rating_average,
+        "count": service.rating_count,
+    }
 
-    user_can_review = False
-    if request.user.is_authenticated:
-        # Require a voucher purchase before allowing a review.
-        user_can_review = Voucher.objects.filter(
-            user=request.user, service=service
-        ).exists()
+    # Require a voucher purchase before allowing a review.
+    user_can_review = service.id in purchased_service_ids(request.user)
 
     if request.method == "POST":
         if not request.user.is_authenticated:
             messages.warning(request, "Log in to leave a review.")
             return redirect("account_login")
+        if not user_can_review:
+            # The cached set may predate a voucher issued by another worker.
+            user_can_review = has_purchased(request.user, service.id)
         if not user_can_review:
             messages.warning(
                 request, "You need to purchase this service before reviewing."
@@ -114,7 +157,9 @@ def service_detail(request, slug):
 
     context = {
         "service": service,
+        "main_image": main_image,
         "reviews": reviews,
+        "next_cursor": next_cursor,
         "rating_stats": rating_stats,
         "form": form,
         "user_can_review": user_can_review,
@@ -122,6 +167,19 @@ def service_detail(request, slug):
     return render(request, "services/service_detail.html", context)
 
 
+def review_page_fragment(request, slug):
+    """Render the next page of a service's reviews as an HTML fragment."""
+    service = get_object_or_404(
+        Service.objects.only("id", "slug"), slug=slug, is_active=True
+    )
+    reviews, next_cursor = review_page(service, request.GET.get("after"))
+    return render(
+        request,
+        "services/review_items.html",
+        {"service": service, "reviews": reviews, "next_cursor": next_cursor},
+    )
+
+
 @login_required
 def review_edit(request, pk):
     """Allow review author to edit their review."""